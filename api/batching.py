@@ -0,0 +1,196 @@
+"""Micro-batching of concurrent extraction requests."""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from api.config import MICROBATCH_WINDOW_MS, MICROBATCH_MAX_SIZE, MICROBATCH_QUEUE_SIZE
+from api.executor import ExecutorBusyError, ExtractionTimeoutError, get_executor
+from api.keyphrase_extractor import extract_keyphrases, extract_keyphrases_batch
+
+
+class MicroBatcher:
+    """
+    Collect /extract calls that arrive close together into one nlp.pipe pass.
+    
+    The first queued request opens a window of `window_ms`; everything that
+    arrives before it closes (or until `max_size` requests are waiting) is
+    dispatched to the executor as a single extract_keyphrases_batch call, and
+    each caller gets back its own result. If the batch call raises an
+    extraction error, its documents are retried one by one so only the
+    failing caller sees it; a full queue or a timeout fails the whole batch. When no batch is running, requests already queued are dispatched
+    at once instead of waiting out the window.
+    At most `queue_size` requests wait; beyond that submit() raises
+    ExecutorBusyError, since a whole batch only takes one executor slot.
+    """
+
+    def __init__(
+        self,
+        window_ms: float = MICROBATCH_WINDOW_MS,
+        max_size: int = MICROBATCH_MAX_SIZE,
+        queue_size: int = MICROBATCH_QUEUE_SIZE,
+        stats_window: int = 1000,
+    ):
+        self.window = window_ms / 1000.0
+        self.max_size = max_size
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = 0
+        self._rejected = 0
+        self._batches = 0
+        self._documents = 0
+        self._max_batch = 0
+        self._recent_sizes = deque(maxlen=stats_window)
+        self._recent_waits = deque(maxlen=stats_window)
+
+    def start(self) -> None:
+        """Start the collector task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        """Stop collecting; requests still queued are cancelled."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            *_, future, _ = self._queue.get_nowait()
+            future.cancel()
+
+    async def submit(self, text: str, p: float, seed: Optional[int] = None) -> List[List[int]]:
+        """Queue one document and wait for its keyphrases; ExecutorBusyError if the queue is full."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((text, p, seed, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self._rejected += 1
+            raise ExecutorBusyError(f"Micro-batch queue full ({self.queue_size} requests waiting)")
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            # Idle: nothing to wait behind, so send what is queued now
+            deadline = loop.time() + (self.window if self._in_flight else 0.0)
+            while len(batch) < self.max_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            while len(batch) < self.max_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._record(batch)
+            # Dispatch without awaiting so the next window fills while this batch runs
+            self._in_flight += 1
+            asyncio.create_task(self._dispatch(batch))
+
+    def _record(self, batch: List[tuple]) -> None:
+        now = time.perf_counter()
+        self._batches += 1
+        self._documents += len(batch)
+        self._max_batch = max(self._max_batch, len(batch))
+        self._recent_sizes.append(len(batch))
+        self._recent_waits.extend(now - queued_at for *_, queued_at in batch)
+
+    async def _dispatch(self, batch: List[tuple]) -> None:
+        texts, ps, seeds, futures, _ = zip(*batch)
+        try:
+            try:
+                results = await get_executor().run(
+                    extract_keyphrases_batch,
+                    texts=list(texts),
+                    ps=list(ps),
+                    seeds=list(seeds),
+                )
+            except (ExecutorBusyError, ExtractionTimeoutError):
+                # Retrying would queue the same work again behind a batch that
+                # may still be running, so every caller gets the 503/504
+                raise
+            except Exception:
+                if len(batch) == 1:
+                    raise
+                # Isolate the failing document instead of failing the whole batch
+                results = await asyncio.gather(
+                    *(get_executor().run(extract_keyphrases, text=text, p=p, seed=seed)
+                      for text, p, seed in zip(texts, ps, seeds)),
+                    return_exceptions=True,
+                )
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._in_flight -= 1
+        for future, result in zip(futures, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch-size and queue-wait statistics (recent values over a sliding window)."""
+        sizes = sorted(self._recent_sizes)
+        waits = sorted(self._recent_waits)
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_size": self.max_size,
+            "queue_size": self.queue_size,
+            "batches": self._batches,
+            "documents": self._documents,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": self._in_flight,
+            "rejected": self._rejected,
+            "batch_size": {
+                "mean": sum(sizes) / len(sizes) if sizes else 0.0,
+                "p50": _percentile(sizes, 0.50),
+                "p95": _percentile(sizes, 0.95),
+                "max": self._max_batch,
+            },
+            "queue_wait_ms": {
+                "mean": 1000.0 * sum(waits) / len(waits) if waits else 0.0,
+                "p50": 1000.0 * _percentile(waits, 0.50),
+                "p95": 1000.0 * _percentile(waits, 0.95),
+                "max": 1000.0 * waits[-1] if waits else 0.0,
+            },
+        }
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+_batcher = None
+
+
+def get_batcher() -> MicroBatcher:
+    """Get the shared micro-batcher, creating it on first use."""
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher()
+    return _batcher
+
+
+async def shutdown_batcher() -> None:
+    """Stop the shared micro-batcher if it was created."""
+    global _batcher
+    if _batcher is not None:
+        await _batcher.stop()
+        _batcher = None
@@ -0,0 +1,338 @@
+"""
+Extraction pipeline benchmarks.
+
+    python -m api.benchmark suite                          # full suite, print table
+    python -m api.benchmark suite --save baseline.json     # record a baseline
+    python -m api.benchmark suite --compare baseline.json  # exit 1 on regressions
+    python -m api.benchmark postprocess [sizes...]         # dict vs columnar
+    python -m api.benchmark encoding [sizes...]            # response encodings
+
+The suite parses synthetic corpora from tweet to book length plus
+attentionisallyouneed.txt, and times each stage separately: spaCy parse,
+extraction, every post-processing function in api/utils.py, and sampling.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from api.config import EXCLUDED_WORDS, MIN_PHRASE_LENGTH, MAX_PHRASE_LENGTH, SPACY_MODEL
+from api.encoding import encode_json, encode_int32, encode_delta
+from api.utils import (
+    create_phrase_object,
+    deduplicate_phrases,
+    filter_excluded_words,
+    filter_by_length,
+    remove_overlapping_phrases,
+    sort_phrases_by_position,
+    random_sample_phrases,
+    PhraseTable,
+    post_process_columns,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DOCUMENT = os.path.join(REPO_ROOT, "attentionisallyouneed.txt")
+
+# Synthetic corpus sizes in characters
+CORPUS_SIZES = {
+    "tweet": 280,
+    "paragraph": 2_000,
+    "article": 20_000,
+    "chapter": 200_000,
+    "book": 900_000,  # just under spaCy's default max_length
+}
+
+# Each stage is repeated until it has run for at least this long (best time is kept)
+MIN_STAGE_SECONDS = 0.2
+MAX_REPEATS = 50
+
+WORDS = ["the model", "attention", "Google Brain", "it", "they", "a", "neural network",
+         "Transformer", "encoder", "decoder layers", "BLEU", "WMT 2014", "we", "x"]
+NAMES = ["Ashish Vaswani", "Noam Shazeer", "Google Research", "Santa Cruz", "OpenAI",
+         "Jeffrey", "University of California", "Monday", "$5 million", "the Transformer"]
+NOUNS = ["model", "attention layer", "decoder", "sequence", "translation task", "network",
+         "benchmark", "result", "training set", "parameter budget", "student", "paper"]
+VERBS = ["improves", "outperforms", "describes", "trains", "evaluates", "replaces", "uses"]
+
+
+def synthetic_text(chars: int, seed: int = 0) -> str:
+    """Deterministic English-like text of about `chars` characters, with named entities."""
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < chars:
+        sentences = []
+        for _ in range(rng.randint(3, 7)):
+            subject = rng.choice(NAMES + NOUNS)
+            sentence = f"{subject[0].upper()}{subject[1:]} {rng.choice(VERBS)} the {rng.choice(NOUNS)}"
+            if rng.random() < 0.5:
+                sentence += f" with {rng.choice(NAMES)}"
+            sentences.append(sentence + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:chars]
+
+
+def build_corpora(names: List[str] = None) -> Dict[str, str]:
+    """Synthetic corpora by name, plus the sample paper if it is present."""
+    corpora = {
+        name: synthetic_text(size, seed=i)
+        for i, (name, size) in enumerate(CORPUS_SIZES.items())
+        if names is None or name in names
+    }
+    if (names is None or "attention" in names) and os.path.exists(SAMPLE_DOCUMENT):
+        with open(SAMPLE_DOCUMENT, encoding="utf-8") as f:
+            corpora["attention"] = f.read()
+    return corpora
+
+
+def synthetic_candidates(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Random overlapping/duplicated candidates resembling extractor output."""
+    rng = random.Random(seed)
+    phrases = []
+    position = 0
+    for _ in range(n):
+        text = rng.choice(WORDS)
+        if rng.random() < 0.1 and phrases:
+            # Duplicate (same span from another extractor)
+            prev = phrases[rng.randrange(len(phrases))]
+            phrases.append(create_phrase_object(prev["phrase"], prev["start"], prev["end"], "ORG"))
+            continue
+        start = max(0, position - rng.randint(0, 8))  # sometimes overlaps the previous phrase
+        phrases.append(create_phrase_object(text, start, start + len(text), "noun_chunk"))
+        position = start + len(text) + rng.randint(1, 20)
+    return phrases
+
+
+def dict_pipeline(phrases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The original five-stage list/dict pipeline."""
+    phrases = deduplicate_phrases(phrases)
+    phrases = filter_excluded_words(phrases, EXCLUDED_WORDS)
+    phrases = filter_by_length(phrases, MIN_PHRASE_LENGTH, MAX_PHRASE_LENGTH)
+    phrases = remove_overlapping_phrases(phrases)
+    return sort_phrases_by_position(phrases)
+
+
+def columnar_pipeline(phrases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """PhraseTable + post_process_columns (table construction included)."""
+    table = PhraseTable.from_phrases(phrases)
+    index = post_process_columns(table, EXCLUDED_WORDS, MIN_PHRASE_LENGTH, MAX_PHRASE_LENGTH)
+    return [phrases[i] for i in index.tolist()]
+
+
+def best_of(fn, arg, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_stage(fn: Callable[[], Any]) -> float:
+    """Best wall time of fn(), repeated until MIN_STAGE_SECONDS have been spent."""
+    best = float("inf")
+    spent = 0.0
+    for _ in range(MAX_REPEATS):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        if spent >= MIN_STAGE_SECONDS:
+            break
+    return best
+
+
+def peak_memory(fn: Callable[[], Any]) -> int:
+    """Peak bytes allocated by Python while running fn() once."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_document(text: str, p: float = 0.5) -> Dict[str, Any]:
+    """Per-stage timings, throughput and peak memory for one document."""
+    from api.keyphrase_extractor import (
+        process_text,
+        apply_extractors,
+        candidate_spans,
+        extract_tables,
+        get_default_extractors,
+        keyphrases_from_doc,
+        post_process_index,
+        post_process_phrases,
+    )
+    
+    extractors = get_default_extractors()
+    doc = process_text(text)
+    raw = apply_extractors(doc, extractors)
+    table = PhraseTable.concat(extract_tables(doc))
+    deduped = deduplicate_phrases(raw)
+    kept = filter_excluded_words(deduped, EXCLUDED_WORDS)
+    sized = filter_by_length(kept, MIN_PHRASE_LENGTH, MAX_PHRASE_LENGTH)
+    non_overlapping = remove_overlapping_phrases(sized)
+    final = sort_phrases_by_position(non_overlapping)
+    assert candidate_spans(doc) == [(p["start"], p["end"]) for p in final], "pipelines disagree"
+    
+    stages = {
+        "parse": lambda: process_text(text),
+        "extract": lambda: apply_extractors(doc, extractors),
+        "deduplicate_phrases": lambda: deduplicate_phrases(raw),
+        "filter_excluded_words": lambda: filter_excluded_words(deduped, EXCLUDED_WORDS),
+        "filter_by_length": lambda: filter_by_length(kept, MIN_PHRASE_LENGTH, MAX_PHRASE_LENGTH),
+        "remove_overlapping_phrases": lambda: remove_overlapping_phrases(sized),
+        "sort_phrases_by_position": lambda: sort_phrases_by_position(non_overlapping),
+        "post_process_phrases": lambda: post_process_phrases(raw),
+        "extract_columns": lambda: PhraseTable.concat(extract_tables(doc)),
+        "post_process_columns": lambda: post_process_index(table),
+        "sample": lambda: sort_phrases_by_position(random_sample_phrases(final, p, seed=0)),
+    }
+    timings = {name: time_stage(fn) for name, fn in stages.items()}
+    
+    def pipeline():
+        keyphrases_from_doc(process_text(text), p=p, seed=0)
+    
+    # End-to-end: parse + columnar extraction and post-processing + sampling
+    total = time_stage(pipeline)
+    return {
+        "chars": len(text),
+        "raw_phrases": len(raw),
+        "final_phrases": len(final),
+        "stages_ms": {name: seconds * 1000 for name, seconds in timings.items()},
+        "total_ms": total * 1000,
+        "chars_per_s": len(text) / total,
+        "docs_per_s": 1 / total,
+        "peak_bytes": peak_memory(pipeline),
+    }
+
+
+def run_suite(names: List[str] = None) -> Dict[str, Any]:
+    """Benchmark every corpus and return a JSON-serializable report."""
+    from api.keyphrase_extractor import get_nlp_model
+    
+    get_nlp_model()  # model load is not part of any stage
+    results = {}
+    for name, text in build_corpora(names).items():
+        print(f"  {name} ({len(text):,} chars)...", file=sys.stderr)
+        results[name] = bench_document(text)
+    return {
+        "meta": {
+            "spacy_model": SPACY_MODEL,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "corpora": results,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    for name, result in report["corpora"].items():
+        print(f"\n{name}: {result['chars']:,} chars, {result['raw_phrases']:,} raw -> "
+              f"{result['final_phrases']:,} phrases")
+        for stage, ms in result["stages_ms"].items():
+            print(f"  {stage:<28} {ms:>10.3f} ms")
+        print(f"  {'TOTAL (pipeline)':<28} {result['total_ms']:>10.3f} ms  "
+              f"{result['chars_per_s']:>12,.0f} chars/s  {result['docs_per_s']:>9.1f} docs/s  "
+              f"peak {result['peak_bytes'] / 1e6:.1f} MB")
+
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any],
+                    tolerance: float, min_delta_ms: float = 0.5) -> List[str]:
+    """Regressions: stages slower (or peak memory larger) than baseline by more than tolerance."""
+    regressions = []
+    for name, base in baseline["corpora"].items():
+        result = current["corpora"].get(name)
+        if result is None:
+            continue
+        for stage, base_ms in list(base["stages_ms"].items()) + [("TOTAL", base["total_ms"])]:
+            ms = result["total_ms"] if stage == "TOTAL" else result["stages_ms"].get(stage)
+            if ms is not None and ms > base_ms * (1 + tolerance) and ms - base_ms > min_delta_ms:
+                regressions.append(f"{name}/{stage}: {base_ms:.3f} ms -> {ms:.3f} ms "
+                                   f"(+{(ms / base_ms - 1) * 100:.0f}%)")
+        if result["peak_bytes"] > base["peak_bytes"] * (1 + tolerance):
+            regressions.append(f"{name}/peak memory: {base['peak_bytes']:,} -> "
+                               f"{result['peak_bytes']:,} bytes")
+    return regressions
+
+
+def bench_post_processing(sizes=(1_000, 10_000, 100_000), repeats: int = 5) -> None:
+    print(f"{'candidates':>10}  {'dict (ms)':>10}  {'columnar (ms)':>13}  {'speedup':>7}")
+    for n in sizes:
+        phrases = synthetic_candidates(n)
+        assert dict_pipeline(phrases) == columnar_pipeline(phrases), "pipelines disagree"
+        dict_time = best_of(dict_pipeline, phrases, repeats)
+        columnar_time = best_of(columnar_pipeline, phrases, repeats)
+        print(f"{n:>10}  {dict_time*1000:>10.2f}  {columnar_time*1000:>13.2f}  {dict_time/columnar_time:>6.2f}x")
+
+
+def bench_encoding(sizes=(1_000, 10_000, 100_000), repeats: int = 5) -> None:
+    """Response size and serialization time: Pydantic model vs. fast JSON vs. binary."""
+    from api.server import ExtractionResponse
+    
+    encoders = {
+        "pydantic": lambda spans: ExtractionResponse(keyphrases=spans).model_dump_json().encode("utf-8"),
+        "json": lambda spans: encode_json({"keyphrases": spans}),
+        "int32": encode_int32,
+        "delta": encode_delta,
+    }
+    print(f"{'spans':>10}  {'encoding':>9}  {'bytes':>9}  {'ms':>8}")
+    for n in sizes:
+        spans = [[p["start"], p["end"]] for p in dict_pipeline(synthetic_candidates(n))]
+        for name, encode in encoders.items():
+            size = len(encode(spans))
+            print(f"{len(spans):>10}  {name:>9}  {size:>9}  {best_of(encode, spans, repeats)*1000:>8.2f}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extraction pipeline benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    suite = commands.add_parser("suite", help="per-stage benchmark over synthetic corpora")
+    suite.add_argument("--corpora", help=f"comma-separated subset of {', '.join(CORPUS_SIZES)}, attention")
+    suite.add_argument("--save", metavar="PATH", help="write the report as a JSON baseline")
+    suite.add_argument("--compare", metavar="PATH", help="fail if slower than this baseline")
+    suite.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (default 0.25 = 25%%)")
+    for name in ("postprocess", "encoding"):
+        sub = commands.add_parser(name)
+        sub.add_argument("sizes", nargs="*", type=int, default=[1_000, 10_000, 100_000])
+    args = parser.parse_args(argv)
+    
+    if args.command == "postprocess":
+        bench_post_processing(args.sizes)
+        return 0
+    if args.command == "encoding":
+        bench_encoding(args.sizes)
+        return 0
+    
+    report = run_suite(args.corpora.split(",") if args.corpora else None)
+    print_report(report)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} REGRESSION(S) vs {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n✓ No regressions vs {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""
+Offline bulk key-phrase extraction.
+
+    python -m api.bulk_extract docs/ -o spans.jsonl              # every *.txt under docs/
+    python -m api.bulk_extract corpus.jsonl -o spans.jsonl -p 1  # JSONL records
+    python -m api.bulk_extract corpus.jsonl -o spans.jsonl --resume
+
+Inputs are streamed: `.jsonl`/`.ndjson` files hold one record per line
+({"id": ..., "text": ..., "p": ..., "seed": ...}; only text is required),
+any other file is one document, and directories are searched for *.txt.
+Documents are sent in chunks to a process pool; each worker loads spaCy once
+and parses its chunk with extract_keyphrases_batch (one nlp.pipe pass). The
+pool already uses every core, so workers parse large documents whole rather
+than starting their own shard pools. Only a bounded number of chunks is in
+flight, so a corpus never has to fit in memory.
+
+Each document produces one output line, {"id": ..., "keyphrases": [[start, end], ...]}
+(or {"id": ..., "error": ...}), written as soon as its chunk finishes, so
+lines come out in completion order. With --resume, ids already in the
+output file are skipped and new lines are appended; documents that failed
+are retried and their old error lines removed, so each id has one line.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from api.config import DEFAULT_SAMPLING_PERCENTAGE, PIPE_BATCH_SIZE
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+
+
+def iter_documents(paths: List[str], text_field: str = "text", id_field: str = "id") -> Iterator[Dict[str, Any]]:
+    """
+    Yield {"id", "text", and optionally "p" and "seed"} for every input document.
+
+    Records without an id are named "<path>:<line>"; plain-text files are named
+    by their path.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(".txt"):
+                        yield from _read_text_file(os.path.join(root, name))
+        elif path.endswith(JSONL_SUFFIXES):
+            yield from _read_jsonl(path, text_field, id_field)
+        else:
+            yield from _read_text_file(path)
+
+
+def _read_text_file(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        yield {"id": path, "text": f.read()}
+
+
+def _read_jsonl(path: str, text_field: str, id_field: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            doc_id = f"{path}:{line_number}"
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"id": doc_id, "error": f"invalid JSON: {e}"}
+                continue
+            doc = {"id": str(record.get(id_field, doc_id))}
+            text = record.get(text_field)
+            if not isinstance(text, str):
+                doc["error"] = f"missing or non-string '{text_field}' field"
+            else:
+                doc["text"] = text
+                for name in ("p", "seed"):
+                    if record.get(name) is not None:
+                        doc[name] = record[name]
+            yield doc
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """
+    Ids already extracted into an output file, for --resume.
+
+    Only lines with keyphrases count, so documents that failed are retried;
+    their error lines are dropped from the file so each id ends up with one
+    line. A line cut short by an interrupted run is truncated away so
+    appended output starts on a fresh line.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    failed = 0
+    with open(output_path, "rb+") as f:
+        valid_end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                result = json.loads(line)
+                doc_id = result["id"]
+            except (ValueError, KeyError, TypeError):
+                break
+            if "keyphrases" in result:
+                done.add(doc_id)
+            else:
+                failed += 1
+            valid_end += len(line)
+        f.truncate(valid_end)
+    if failed:
+        _drop_error_lines(output_path)
+    return done
+
+
+def _drop_error_lines(output_path: str) -> None:
+    """Rewrite output_path without its error lines (via a temporary file, so it is never left half-written)."""
+    tmp_path = output_path + ".tmp"
+    with open(output_path, "rb") as src, open(tmp_path, "wb") as dst:
+        for line in src:
+            if "keyphrases" in json.loads(line):
+                dst.write(line)
+    os.replace(tmp_path, output_path)
+
+
+def extract_chunk(
+    docs: List[Dict[str, Any]],
+    p: float = DEFAULT_SAMPLING_PERCENTAGE,
+    seed: Optional[int] = None,
+    post_process: bool = True,
+    batch_size: int = PIPE_BATCH_SIZE,
+) -> List[Dict[str, Any]]:
+    """Worker: extract one chunk of documents with a single nlp.pipe pass."""
+    from api.keyphrase_extractor import extract_keyphrases, extract_keyphrases_batch
+
+    results = [{"id": doc["id"], "error": doc["error"]} for doc in docs if "error" in doc]
+    docs = [doc for doc in docs if "error" not in doc]
+    ps = [doc.get("p", p) for doc in docs]
+    seeds = [doc.get("seed", seed) for doc in docs]
+    try:
+        batch = extract_keyphrases_batch(
+            [doc["text"] for doc in docs], ps, seeds,
+            post_process=post_process, batch_size=batch_size, n_process=1,
+        )
+    except Exception:
+        # Isolate the failing document instead of losing the whole chunk
+        batch = []
+        for doc, doc_p, doc_seed in zip(docs, ps, seeds):
+            try:
+                batch.append(extract_keyphrases(doc["text"], post_process=post_process, p=doc_p, seed=doc_seed))
+            except Exception as e:
+                batch.append(e)
+    for doc, spans in zip(docs, batch):
+        if isinstance(spans, Exception):
+            results.append({"id": doc["id"], "error": f"{type(spans).__name__}: {spans}"})
+        else:
+            results.append({"id": doc["id"], "keyphrases": spans})
+    return results
+
+
+def _chunks(docs: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for doc in docs:
+        chunk.append(doc)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker() -> None:
+    from api import keyphrase_extractor
+    # One worker per core already: no nested shard pools. Texts up to
+    # nlp.max_length are parsed whole, longer ones shard in-process.
+    keyphrase_extractor.SHARD_THRESHOLD_CHARS = float("inf")
+    keyphrase_extractor.SHARD_WORKERS = 0
+    keyphrase_extractor.get_nlp_model()
+
+
+class Progress:
+    """Running totals, printed to stderr at most every `interval` seconds."""
+
+    def __init__(self, interval: float = 5.0, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.docs = 0
+        self.chars = 0
+        self.errors = 0
+        self.skipped = 0
+
+    def add(self, results: List[Dict[str, Any]], chars: int) -> None:
+        self.docs += len(results)
+        self.chars += chars
+        self.errors += sum(1 for result in results if "error" in result)
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        elapsed = time.perf_counter() - self.started
+        rate = self.docs / elapsed if elapsed > 0 else 0.0
+        chars_rate = self.chars / elapsed if elapsed > 0 else 0.0
+        prefix = "Done:" if final else "Progress:"
+        print(f"{prefix} {self.docs} docs in {elapsed:.1f}s ({rate:.1f} docs/s, {chars_rate / 1000:.0f}k chars/s), "
+              f"{self.errors} errors, {self.skipped} skipped", file=self.stream, flush=True)
+
+
+def run(
+    paths: List[str],
+    output_path: str,
+    p: float = DEFAULT_SAMPLING_PERCENTAGE,
+    seed: Optional[int] = None,
+    post_process: bool = True,
+    workers: int = None,
+    chunk_size: int = 256,
+    batch_size: int = PIPE_BATCH_SIZE,
+    resume: bool = False,
+    text_field: str = "text",
+    id_field: str = "id",
+    progress_interval: float = 5.0,
+) -> Progress:
+    """Extract every input document into output_path; returns the final counters."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    done = completed_ids(output_path) if resume else set()
+    progress = Progress(progress_interval)
+
+    def remaining():
+        for doc in iter_documents(paths, text_field, id_field):
+            if doc["id"] in done:
+                progress.skipped += 1
+            else:
+                yield doc
+
+    options = dict(p=p, seed=seed, post_process=post_process, batch_size=batch_size)
+    mode = "a" if resume else "w"
+    with open(output_path, mode, encoding="utf-8") as out:
+
+        def write(results, chars):
+            for result in results:
+                out.write(json.dumps(result, separators=(",", ":")) + "\n")
+            out.flush()
+            progress.add(results, chars)
+
+        if workers <= 0:
+            # In-process, for debugging and tiny corpora; parses like a worker would
+            from api import keyphrase_extractor
+            saved = keyphrase_extractor.SHARD_THRESHOLD_CHARS, keyphrase_extractor.SHARD_WORKERS
+            _init_worker()
+            try:
+                for chunk in _chunks(remaining(), chunk_size):
+                    write(extract_chunk(chunk, **options), _chunk_chars(chunk))
+            finally:
+                keyphrase_extractor.SHARD_THRESHOLD_CHARS, keyphrase_extractor.SHARD_WORKERS = saved
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                in_flight = {}
+                try:
+                    for chunk in _chunks(remaining(), chunk_size):
+                        # Keep every worker busy with one chunk queued behind it, no more
+                        while len(in_flight) >= 2 * workers:
+                            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                            for future in finished:
+                                write(future.result(), in_flight.pop(future))
+                        in_flight[pool.submit(extract_chunk, chunk, **options)] = _chunk_chars(chunk)
+                    for future in list(in_flight):
+                        write(future.result(), in_flight.pop(future))
+                except BaseException:
+                    for future in in_flight:
+                        future.cancel()
+                    raise
+    progress.report(final=True)
+    return progress
+
+
+def _chunk_chars(chunk: List[Dict[str, Any]]) -> int:
+    return sum(len(doc.get("text", "")) for doc in chunk)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract key-phrase spans from files or JSONL records")
+    parser.add_argument("inputs", nargs="+", help="text files, directories of *.txt, or .jsonl/.ndjson files")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to write spans to")
+    parser.add_argument("-p", type=float, default=DEFAULT_SAMPLING_PERCENTAGE,
+                        help=f"sampling percentage unless a record sets p (default {DEFAULT_SAMPLING_PERCENTAGE})")
+    parser.add_argument("--seed", type=int, help="sampling seed unless a record sets seed")
+    parser.add_argument("--no-post-process", action="store_true", help="keep raw candidate spans")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, 0 to run in-process (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="documents per worker task (default 256)")
+    parser.add_argument("--batch-size", type=int, default=PIPE_BATCH_SIZE,
+                        help=f"nlp.pipe batch size (default {PIPE_BATCH_SIZE})")
+    parser.add_argument("--resume", action="store_true", help="skip ids already in the output and append")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the text (default text)")
+    parser.add_argument("--id-field", default="id", help="JSONL field holding the document id (default id)")
+    parser.add_argument("--progress-interval", type=float, default=5.0,
+                        help="seconds between progress lines (default 5)")
+    args = parser.parse_args(argv)
+
+    try:
+        progress = run(
+            args.inputs, args.output,
+            p=args.p, seed=args.seed, post_process=not args.no_post_process,
+            workers=args.workers, chunk_size=args.chunk_size, batch_size=args.batch_size,
+            resume=args.resume, text_field=args.text_field, id_field=args.id_field,
+            progress_interval=args.progress_interval,
+        )
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun with --resume to continue into {args.output}", file=sys.stderr)
+        return 130
+    return 1 if progress.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Content-addressed cache of post-processed candidate spans."""
+
+import hashlib
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.config import CANDIDATE_CACHE_MAX_BYTES
+
+# Rough per-entry bookkeeping cost (OrderedDict node, key string, array header)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def config_fingerprint(settings: Dict[str, Any]) -> str:
+    """Hash of the settings that decide which candidate spans a text yields."""
+    items = []
+    for name in sorted(settings):
+        value = settings[name]
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        items.append(f"{name}={value!r}")
+    return hashlib.sha256("\n".join(items).encode("utf-8")).hexdigest()[:16]
+
+
+def candidate_cache_key(text: str, fingerprint: str, post_process: bool = True) -> str:
+    """Cache key for text parsed with the default extractors under the settings `fingerprint` hashes."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{digest}:{fingerprint}:{int(post_process)}"
+
+
+class CandidateCache:
+    """
+    Thread-safe LRU cache of candidate spans, bounded by total bytes.
+    
+    Spans are stored as flat int32 arrays (start, end, start, end, ...) so a
+    cached document costs 8 bytes per candidate rather than a list of dicts.
+    The text itself is never stored, only its hash.
+    """
+
+    def __init__(self, max_bytes: int = CANDIDATE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, array]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(key: str, spans: array) -> int:
+        return sys.getsizeof(spans) + len(key) + ENTRY_OVERHEAD_BYTES
+
+    def get(self, key: str) -> Optional[List[Tuple[int, int]]]:
+        """Return cached (start, end) spans, or None on a miss."""
+        with self._lock:
+            spans = self._entries.get(key)
+            if spans is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return list(zip(spans[0::2], spans[1::2]))
+
+    def put(self, key: str, spans: List[Tuple[int, int]]) -> None:
+        """Store spans, evicting least recently used entries to stay under max_bytes."""
+        flat = array("i", [offset for span in spans for offset in span])
+        size = self._entry_size(key, flat)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= self._entry_size(key, old)
+            self._entries[key] = flat
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, old_spans = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(old_key, old_spans)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_candidate_cache = None
+
+
+def get_candidate_cache() -> CandidateCache:
+    """Get the shared candidate cache (one per process)."""
+    global _candidate_cache
+    if _candidate_cache is None:
+        _candidate_cache = CandidateCache()
+    return _candidate_cache
@@ -0,0 +1,128 @@
+"""Compact encodings for keyphrase responses."""
+
+from itertools import chain
+from typing import Any, Dict, List
+
+import numpy as np
+from pydantic_core import to_json
+
+JSON = "application/json"
+OCTET_STREAM = "application/octet-stream"
+NDJSON = "application/x-ndjson"
+
+# Encodings accepted via ?encoding=...
+ENCODINGS = ("json", "int32", "delta")
+
+
+def _accept_quality(accept: str, media_type: str) -> float:
+    """
+    q-value the Accept header gives media_type, from its most specific
+    matching range (type/subtype over type/* over */*); 0.0 if none matches.
+    """
+    main_type = media_type.split("/")[0]
+    best_specificity, quality = -1, 0.0
+    for media_range in accept.split(","):
+        name, *params = (part.strip() for part in media_range.split(";"))
+        name = name.lower()
+        if name == media_type:
+            specificity = 2
+        elif name == f"{main_type}/*":
+            specificity = 1
+        elif name == "*/*":
+            specificity = 0
+        else:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if specificity > best_specificity:
+            best_specificity, quality = specificity, q
+    return quality
+
+
+def negotiate_encoding(encoding: str = None, accept: str = None) -> str:
+    """
+    Pick the response encoding from ?encoding= or, failing that, the Accept
+    header: int32 if application/octet-stream has a higher q-value than JSON,
+    else JSON (also when neither is acceptable).
+    """
+    if encoding:
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}' (use one of {', '.join(ENCODINGS)})")
+        return encoding
+    if accept and _accept_quality(accept, OCTET_STREAM) > _accept_quality(accept, JSON):
+        return "int32"
+    return "json"
+
+
+def _flatten(keyphrases: List[List[int]], dtype) -> np.ndarray:
+    # fromiter over a flat chain avoids NumPy inspecting every nested list
+    return np.fromiter(chain.from_iterable(keyphrases), dtype=dtype, count=2 * len(keyphrases))
+
+
+def encode_json(payload: Dict[str, Any]) -> bytes:
+    """Serialize plain lists straight to JSON, skipping per-element model validation."""
+    return to_json(payload)
+
+
+def encode_ndjson(items: List[Any]) -> bytes:
+    """One JSON value per line (NDJSON), for streamed responses."""
+    return b"".join(to_json(item) + b"\n" for item in items)
+
+
+def encode_int32(keyphrases: List[List[int]]) -> bytes:
+    """Flat little-endian int32 array: start0, end0, start1, end1, ..."""
+    return _flatten(keyphrases, "<i4").tobytes()
+
+
+def decode_int32(data: bytes) -> List[List[int]]:
+    """Inverse of encode_int32."""
+    return np.frombuffer(data, dtype="<i4").reshape(-1, 2).tolist()
+
+
+def encode_delta(keyphrases: List[List[int]]) -> bytes:
+    """
+    Delta-encoded offsets as zigzag LEB128 varints.
+    
+    Each offset is stored as the difference from the previous one (start
+    from the previous end, end from its start), so sorted spans over typical
+    text take one or two bytes per offset instead of four.
+    """
+    flat = _flatten(keyphrases, np.int64)
+    if flat.size == 0:
+        return b""
+    deltas = np.diff(flat, prepend=0)
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).astype(np.uint64)
+    # Bytes needed per value (7 payload bits each); only loop as far as the largest value needs
+    widths = np.ones(flat.size, dtype=np.uint8)
+    shift = 7
+    largest = int(zigzag.max())
+    while largest >> shift:
+        widths += zigzag >= (1 << shift)
+        shift += 7
+    max_width = shift // 7
+    # Build every varint column-wise into an (n, max_width) grid, then keep the used cells
+    grid = np.empty((flat.size, max_width), dtype=np.uint8)
+    for column in range(max_width):
+        payload = ((zigzag >> np.uint64(7 * column)) & np.uint64(0x7F)).astype(np.uint8)
+        grid[:, column] = payload | ((widths > column + 1).astype(np.uint8) << 7)
+    return grid[np.arange(max_width)[None, :] < widths[:, None]].tobytes()
+
+
+def decode_delta(data: bytes) -> List[List[int]]:
+    """Inverse of encode_delta."""
+    values = []
+    current = shift = 0
+    for byte in data:
+        current |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append((current >> 1) ^ -(current & 1))
+            current = shift = 0
+    offsets = np.cumsum(np.asarray(values, dtype=np.int64))
+    return offsets.reshape(-1, 2).tolist()
@@ -0,0 +1,141 @@
+"""Execution backends that keep CPU-bound extraction off the event loop."""
+
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from api.config import (
+    EXTRACTION_BACKEND,
+    EXTRACTION_WORKERS,
+    EXTRACTION_QUEUE_SIZE,
+    EXTRACTION_TIMEOUT,
+    WARMUP_TIMEOUT,
+)
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the extraction queue is full."""
+
+
+class ExtractionTimeoutError(TimeoutError):
+    """Raised when an extraction does not finish within its timeout."""
+
+
+def _preload_model():
+    """Process-pool initializer: load the spaCy model once per worker, with no nested shard pool."""
+    from api.keyphrase_extractor import disable_shard_pool, get_nlp_model
+    disable_shard_pool()
+    get_nlp_model()
+
+
+def create_pool(backend: str, workers: int) -> Executor:
+    """Create the underlying thread or process pool."""
+    if backend == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract")
+    if backend == "process":
+        return ProcessPoolExecutor(max_workers=workers, initializer=_preload_model)
+    raise ValueError(f"Unknown extraction backend '{backend}' (use 'thread' or 'process')")
+
+
+class ExtractionExecutor:
+    """
+    Bounded executor for extraction calls.
+    
+    At most `workers + queue_size` calls are admitted at once; further calls
+    fail fast with ExecutorBusyError instead of piling up. A slot is only
+    freed once the underlying call has really finished, so timed-out work
+    still counts against the bound while it runs.
+    """
+
+    def __init__(
+        self,
+        backend: str = EXTRACTION_BACKEND,
+        workers: int = EXTRACTION_WORKERS,
+        queue_size: int = EXTRACTION_QUEUE_SIZE,
+        timeout: float = EXTRACTION_TIMEOUT,
+    ):
+        self.backend = backend
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self._pool = create_pool(backend, workers)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) in the pool and await its result."""
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise ExecutorBusyError(
+                    f"Extraction queue full ({self.capacity} requests pending)"
+                )
+            self._pending += 1
+        try:
+            future = self._pool.submit(partial(fn, *args, **kwargs))
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            # Cancelling drops the call if it is still queued; a running call
+            # cannot be interrupted and keeps its slot until it returns.
+            future.cancel()
+            with self._lock:
+                self._timed_out += 1
+            raise ExtractionTimeoutError(f"Extraction timed out after {timeout:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """Current queue occupancy and rejection counters."""
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "pending": self._pending,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
+
+    def shutdown(self) -> None:
+        """Stop accepting work and cancel anything still queued."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor = None
+
+
+def get_executor() -> ExtractionExecutor:
+    """Get the shared extraction executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ExtractionExecutor()
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Shut down the shared executor if it was created."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+async def warm_up_executor(executor: Optional[ExtractionExecutor] = None) -> None:
+    """Load and warm spaCy where extraction runs: once for threads, once per worker process."""
+    from api.keyphrase_extractor import warm_up
+    executor = executor or get_executor()
+    runs = executor.workers if executor.backend == "process" else 1
+    await asyncio.gather(*(executor.run(warm_up, timeout=WARMUP_TIMEOUT) for _ in range(runs)))
@@ -1,56 +1,148 @@
 """Core NLP key-phrase extraction module."""
 
-import spacy
-from typing import List, Dict, Any, Callable, Set
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, Set, Optional, Tuple
 from functools import lru_cache
+from itertools import repeat
 import time
 
+from api.cache import candidate_cache_key, config_fingerprint, get_candidate_cache
+from api.metrics import REGISTRY
 from api.utils import (
     create_phrase_object,
-    filter_by_length,
-    remove_overlapping_phrases,
-    deduplicate_phrases,
-    sort_phrases_by_position,
-    filter_excluded_words,
     random_sample_phrases,
+    iter_text_blocks,
+    split_text_into_shards,
+    add_shard_context,
+    SpanStreamSampler,
+    PhraseTable,
+    post_process_columns,
 )
 from api.config import (
     SPACY_MODEL,
     EXTRACT_NOUN_CHUNKS,
     EXTRACT_NAMED_ENTITIES,
     EXTRACT_VERB_PHRASES,
+    TRIM_PIPELINE,
+    PIPELINE_REQUIREMENTS,
     ENTITY_TYPES,
     MIN_PHRASE_LENGTH,
     MAX_PHRASE_LENGTH,
     REMOVE_OVERLAPS,
     EXCLUDED_WORDS,
     DEFAULT_SAMPLING_PERCENTAGE,
+    PIPE_BATCH_SIZE,
+    PIPE_N_PROCESS,
+    CANDIDATE_CACHE_ENABLED,
+    SHARD_THRESHOLD_CHARS,
+    SHARD_MAX_CHARS,
+    SHARD_WORKERS,
+    SHARD_CONTEXT_CHARS,
+    STREAM_BLOCK_CHARS,
+    WARMUP_TEXT,
 )
 
 
 _nlp_model = None
+_nlp_model_lock = threading.Lock()
+_shard_pool = None
+_shard_pool_lock = threading.Lock()
+
+# Per-stage latency; with EXTRACTION_BACKEND = "process" only the parent's stages are seen
+STAGE_LATENCY = REGISTRY.histogram(
+    "keyphrase_stage_seconds", "Keyphrase extraction latency by pipeline stage", ("stage",)
+)
+
+
+def required_components(nlp) -> Set[str]:
+    """Pipeline components needed by the extractors enabled in config."""
+    required = set()
+    if EXTRACT_NOUN_CHUNKS:
+        required |= PIPELINE_REQUIREMENTS["noun_chunks"]
+    if EXTRACT_NAMED_ENTITIES:
+        required |= PIPELINE_REQUIREMENTS["named_entities"]
+    if EXTRACT_VERB_PHRASES:
+        required |= PIPELINE_REQUIREMENTS["verb_phrases"]
+    # Shared embedding layers (tok2vec, transformer) must stay on while any
+    # required component listens to them.
+    for name, component in nlp.components:
+        if required & set(getattr(component, "listening_components", [])):
+            required.add(name)
+    return required
+
+
+def trim_pipeline(nlp):
+    """
+    Disable components not needed by the enabled extractors.
+    
+    Their names are recorded in nlp.meta["trimmed"], apart from components
+    the model itself ships disabled (e.g. senter).
+    """
+    required = required_components(nlp)
+    trimmed = nlp.meta.setdefault("trimmed", [])
+    for name in list(nlp.pipe_names):
+        if name not in required:
+            # Disabled rather than excluded so profile_parse can still time the full pipeline
+            nlp.disable_pipe(name)
+            trimmed.append(name)
+    return nlp
 
 
 @lru_cache(maxsize=1)
 def load_nlp_model(model_name: str = SPACY_MODEL):
     """Load and cache spaCy model."""
+    # Imported here so importing this module (and starting the servers) stays fast
+    import spacy
     try:
-        return spacy.load(model_name)
+        nlp = spacy.load(model_name)
     except OSError:
         raise RuntimeError(
             f"spaCy model '{model_name}' not found. "
             f"Install: python -m spacy download {model_name}"
         )
+    if TRIM_PIPELINE:
+        trim_pipeline(nlp)
+    return nlp
 
 
 def get_nlp_model():
     """Get cached NLP model."""
     global _nlp_model
     if _nlp_model is None:
-        _nlp_model = load_nlp_model()
+        # Concurrent first requests wait for one load instead of each loading a copy
+        with _nlp_model_lock:
+            if _nlp_model is None:
+                _nlp_model = load_nlp_model()
     return _nlp_model
 
 
+def warm_up(text: str = WARMUP_TEXT) -> int:
+    """
+    Load the model and run the full pipeline once, bypassing the candidate cache.
+    
+    The first parse after loading pays for lazy initialisation inside spaCy
+    (vocab lookups, component setup), so warming with a real document keeps
+    that cost off the first user request. Returns the number of candidates.
+    """
+    nlp = get_nlp_model()
+    for doc in nlp.pipe([text, text]):
+        spans = candidate_spans(doc)
+    sample_spans(spans, DEFAULT_SAMPLING_PERCENTAGE, seed=0)
+    return len(spans)
+
+
+def noun_chunk_spans(doc) -> Iterable[Any]:
+    """Noun chunks of a spaCy doc, as spans."""
+    return doc.noun_chunks
+
+
+def named_entity_spans(doc, entity_types: Set[str] = ENTITY_TYPES) -> List[Any]:
+    """Named entities of the configured types in a spaCy doc, as spans."""
+    return [ent for ent in doc.ents if ent.label_ in entity_types]
+
+
 def extract_noun_chunks(doc) -> List[Dict[str, Any]]:
     """Extract noun chunks from spaCy doc."""
     return [
@@ -60,7 +152,7 @@ def extract_noun_chunks(doc) -> List[Dict[str, Any]]:
             end=chunk.end_char,
             phrase_type="noun_chunk"
         )
-        for chunk in doc.noun_chunks
+        for chunk in noun_chunk_spans(doc)
     ]
 
 
@@ -73,8 +165,7 @@ def extract_named_entities(doc, entity_types: Set[str] = ENTITY_TYPES) -> List[D
             end=ent.end_char,
             phrase_type=ent.label_
         )
-        for ent in doc.ents
-        if ent.label_ in entity_types
+        for ent in named_entity_spans(doc, entity_types)
     ]
 
 def apply_extractors(doc, extractors: List[Callable]) -> List[Dict[str, Any]]:
@@ -95,20 +186,266 @@ def get_default_extractors() -> List[Callable]:
     return extractors
 
 
+def get_default_span_sources() -> List[Callable]:
+    """Span-returning counterparts of get_default_extractors, for building phrase tables directly."""
+    sources = []
+    if EXTRACT_NOUN_CHUNKS:
+        sources.append(noun_chunk_spans)
+    if EXTRACT_NAMED_ENTITIES:
+        sources.append(named_entity_spans)
+    return sources
+
+
+def extract_tables(doc, extractors: Optional[List[Callable]] = None, offset: int = 0) -> List[PhraseTable]:
+    """
+    One PhraseTable per extractor, offsets shifted by offset. The default
+    extractors fill their columns straight from spaCy spans; custom ones
+    return phrase objects (see create_phrase_object).
+    """
+    if extractors is None:
+        return [PhraseTable.from_spans(source(doc), offset) for source in get_default_span_sources()]
+    return [PhraseTable.from_phrases(extractor(doc), offset) for extractor in extractors]
+
+
 def process_text(text: str) -> Any:
     """Process text with spaCy."""
     return get_nlp_model()(text)
 
 
+def profile_parse(text: str, repeats: int = 3) -> Dict[str, Any]:
+    """
+    Time parsing text with the trimmed pipeline and with the model's default
+    pipeline (the trimmed one plus the components trim_pipeline disabled).
+    """
+    nlp = get_nlp_model()
+    
+    def best_time(components) -> float:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            doc = nlp.make_doc(text)
+            for _, proc in components:
+                doc = proc(doc)
+            best = min(best, time.perf_counter() - start)
+        return best
+    
+    # Running the components by hand leaves the shared model's enabled/disabled
+    # state untouched, so this is safe while other requests are parsing.
+    trimmed_names = set(nlp.meta.get("trimmed", ()))
+    trimmed = best_time(nlp.pipeline)
+    full = best_time([(name, proc) for name, proc in nlp.components
+                      if name in nlp.pipe_names or name in trimmed_names])
+    return {
+        "chars": len(text),
+        "active": nlp.pipe_names,
+        "disabled": [name for name in nlp.component_names if name in trimmed_names],
+        "trimmed_ms": trimmed * 1000,
+        "full_ms": full * 1000,
+        "speedup": full / trimmed if trimmed else 0.0,
+    }
+
+
 def post_process_phrases(phrases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Apply post-processing to extracted phrases ."""
-    phrases = deduplicate_phrases(phrases)
-    phrases = filter_excluded_words(phrases, EXCLUDED_WORDS)
-    phrases = filter_by_length(phrases, MIN_PHRASE_LENGTH, MAX_PHRASE_LENGTH)
-    if REMOVE_OVERLAPS:
-        phrases = remove_overlapping_phrases(phrases)
-    phrases = sort_phrases_by_position(phrases)
-    return phrases
+    table = PhraseTable.from_phrases(phrases)
+    return [phrases[i] for i in post_process_index(table).tolist()]
+
+
+def post_process_index(table: PhraseTable):
+    """Row indices of a phrase table that survive post-processing, in text order."""
+    return post_process_columns(
+        table,
+        EXCLUDED_WORDS,
+        MIN_PHRASE_LENGTH,
+        MAX_PHRASE_LENGTH,
+        remove_overlaps=REMOVE_OVERLAPS,
+    )
+
+
+def candidate_spans(
+    doc,
+    extractors: List[Callable] = None,
+    post_process: bool = True,
+    verbose: bool = False
+) -> List[Tuple[int, int]]:
+    """Run extraction and post-processing on a parsed doc, returning (start, end) spans."""
+    # Step 2: Extract phrases
+    t2 = time.perf_counter()
+    table = PhraseTable.concat(extract_tables(doc, extractors))
+    elapsed = time.perf_counter() - t2
+    STAGE_LATENCY.observe(elapsed, stage="extract")
+    if verbose:
+        print(f"  Extraction: {elapsed:.3f}s ({len(table)} raw phrases)")
+    
+    return table_to_spans(table, post_process, verbose)
+
+
+def table_to_spans(
+    table: PhraseTable,
+    post_process: bool = True,
+    verbose: bool = False
+) -> List[Tuple[int, int]]:
+    """Optionally post-process a phrase table and reduce it to (start, end) spans."""
+    # Step 3: Post-process
+    if not post_process:
+        return table.spans()
+    
+    t3 = time.perf_counter()
+    spans = table.spans(post_process_index(table))
+    elapsed = time.perf_counter() - t3
+    STAGE_LATENCY.observe(elapsed, stage="post_process")
+    if verbose:
+        print(f"  Post-processing: {elapsed:.3f}s ({len(spans)} after filter)")
+    return spans
+
+
+def get_shard_pool() -> ProcessPoolExecutor:
+    """Get the worker pool for sharded extraction; each worker loads spaCy once."""
+    global _shard_pool
+    if _shard_pool is None:
+        with _shard_pool_lock:
+            # Re-check: another thread may have created it while we waited
+            if _shard_pool is None:
+                _shard_pool = ProcessPoolExecutor(max_workers=SHARD_WORKERS, initializer=get_nlp_model)
+    return _shard_pool
+
+
+def shutdown_shard_pool() -> None:
+    """Shut down the shard worker pool if it was created."""
+    global _shard_pool
+    with _shard_pool_lock:
+        if _shard_pool is not None:
+            _shard_pool.shutdown(wait=False, cancel_futures=True)
+            _shard_pool = None
+
+
+def disable_shard_pool() -> None:
+    """
+    Parse shards one after another in-process from now on (SHARD_WORKERS = 0).
+
+    For code already running in a pool worker, where the pool uses the cores
+    and a nested shard pool would start SHARD_WORKERS more spaCy processes.
+    """
+    global SHARD_WORKERS
+    SHARD_WORKERS = 0
+
+
+def is_large_text(text: str) -> bool:
+    """Whether text should take the sharded path instead of a single parse."""
+    return len(text) > min(SHARD_THRESHOLD_CHARS, get_nlp_model().max_length)
+
+
+def _extract_shard(
+    shard: Tuple[int, str, int, int], extractors: Optional[List[Callable]]
+) -> List[PhraseTable]:
+    """
+    Worker: parse one shard with its context and return each extractor's
+    phrase table at global offsets, keeping only rows starting in the shard's own range.
+    """
+    offset, text, own_start, own_end = shard
+    doc = process_text(text)
+    return [table.starting_in(own_start, own_end) for table in extract_tables(doc, extractors, offset)]
+
+
+def sharded_candidate_spans(
+    text: str,
+    extractors: List[Callable] = None,
+    post_process: bool = True,
+    verbose: bool = False
+) -> List[Tuple[int, int]]:
+    """
+    Candidate spans for a very large text, parsed as shards in parallel.
+    
+    The text is cut at paragraph/sentence boundaries, each shard is parsed in a
+    worker process together with SHARD_CONTEXT_CHARS of neighbouring text (so
+    a sentence split by a cut still parses whole), and offsets are shifted
+    back to the whole text before post-processing. Each phrase is kept only
+    by the shard its start falls in. Phrases are regrouped extractor by
+    extractor so they come out in the same order as from a single parse.
+    Custom extractors must be picklable (module-level functions).
+    """
+    t1 = time.perf_counter()
+    # Shard plus context on both sides must stay within one parse
+    max_length = get_nlp_model().max_length
+    context_chars = min(SHARD_CONTEXT_CHARS, max_length // 4)
+    max_chars = min(SHARD_MAX_CHARS, max_length - 2 * context_chars)
+    shards = add_shard_context(text, split_text_into_shards(text, max_chars), context_chars)
+    shard_map = get_shard_pool().map if SHARD_WORKERS > 0 else map
+    per_shard = list(shard_map(_extract_shard, shards, repeat(extractors)))
+    table = PhraseTable.concat([
+        shard_tables[extractor_index]
+        for extractor_index in range(len(per_shard[0]) if per_shard else 0)
+        for shard_tables in per_shard
+    ])
+    elapsed = time.perf_counter() - t1
+    STAGE_LATENCY.observe(elapsed, stage="sharded_parse_extract")
+    if verbose:
+        print(f"  Sharded parse + extraction: {elapsed:.3f}s "
+              f"({len(shards)} shards, {len(table)} raw phrases)")
+    
+    return table_to_spans(table, post_process, verbose)
+
+
+def sample_spans(
+    spans: List[Tuple[int, int]],
+    p: float = DEFAULT_SAMPLING_PERCENTAGE,
+    seed: Optional[int] = None,
+    verbose: bool = False
+) -> List[List[int]]:
+    """Sample candidate spans and return them as [start, end] pairs in text order."""
+    # Step 4: Sample
+    if p < 1.0:
+        t4 = time.perf_counter()
+        spans = random_sample_phrases(spans, p, seed)
+        spans = sorted(spans, key=lambda span: span[0])
+        elapsed = time.perf_counter() - t4
+        STAGE_LATENCY.observe(elapsed, stage="sample")
+        if verbose:
+            print(f"  Sampling: {elapsed:.3f}s ({len(spans)} after sample)")
+    
+    return [[start, end] for start, end in spans]
+
+
+def keyphrases_from_doc(
+    doc,
+    extractors: List[Callable] = None,
+    post_process: bool = True,
+    p: float = DEFAULT_SAMPLING_PERCENTAGE,
+    seed: Optional[int] = None,
+    verbose: bool = False
+) -> List[List[int]]:
+    """Run extraction, post-processing and sampling on a parsed doc."""
+    spans = candidate_spans(doc, extractors, post_process, verbose)
+    return sample_spans(spans, p, seed, verbose)
+
+
+def candidate_fingerprint() -> str:
+    """
+    Hash of the settings that decide the candidate spans, read from this
+    module when the key is built, so a setting changed at runtime (as tests
+    and bulk_extract do) also changes the key. Shard settings are left out
+    because sharding yields the same spans.
+    """
+    return config_fingerprint({
+        "SPACY_MODEL": SPACY_MODEL,
+        "EXTRACT_NOUN_CHUNKS": EXTRACT_NOUN_CHUNKS,
+        "EXTRACT_NAMED_ENTITIES": EXTRACT_NAMED_ENTITIES,
+        "EXTRACT_VERB_PHRASES": EXTRACT_VERB_PHRASES,
+        "ENTITY_TYPES": ENTITY_TYPES,
+        "MIN_PHRASE_LENGTH": MIN_PHRASE_LENGTH,
+        "MAX_PHRASE_LENGTH": MAX_PHRASE_LENGTH,
+        "REMOVE_OVERLAPS": REMOVE_OVERLAPS,
+        "EXCLUDED_WORDS": EXCLUDED_WORDS,
+    })
+
+
+def _cache_key(text: str, extractors: Optional[List[Callable]], post_process: bool) -> Optional[str]:
+    """Cache key for a text, or None when the result must not be cached."""
+    # Custom extractors are arbitrary callables, so only the config-driven
+    # default pipeline is cacheable.
+    if not CANDIDATE_CACHE_ENABLED or extractors is not None:
+        return None
+    return candidate_cache_key(text, candidate_fingerprint(), post_process)
 
 
 def extract_keyphrases(
@@ -116,16 +453,23 @@ def extract_keyphrases(
     extractors: List[Callable] = None,
     post_process: bool = True,
     p: float = DEFAULT_SAMPLING_PERCENTAGE,
+    seed: Optional[int] = None,
     verbose: bool = False
 ) -> List[List[int]]:
     """
     Extract key phrases from text and return indices.
     
+    Candidate spans for the default extractors are cached by text hash, so a
+    repeat request with a different p skips spaCy and only re-samples. Texts
+    over SHARD_THRESHOLD_CHARS (or spaCy's max_length) are parsed in parallel
+    shards.
+    
     Args:
         text: Input text
         extractors: Custom extraction functions (optional)
         post_process: Apply filtering/deduplication
         p: Sampling percentage (0.0 to 1.0), default 0.3
+        seed: Sampling seed for reproducible results (optional)
         verbose: Print timing info
     
     Returns:
@@ -134,40 +478,166 @@ def extract_keyphrases(
     if not text or not text.strip():
         return []
     
-    total_start = time.time()
+    total_start = time.perf_counter()
     
-    # Step 1: Process with spaCy
-    t1 = time.time()
-    doc = process_text(text)
-    if verbose:
-        print(f"  spaCy processing: {time.time()-t1:.3f}s")
+    key = _cache_key(text, extractors, post_process)
+    spans = get_candidate_cache().get(key) if key else None
+    if spans is not None:
+        if verbose:
+            print(f"  Cache hit: {len(spans)} candidates")
+    elif is_large_text(text):
+        # Too big for one parse (or one core): shard across worker processes
+        spans = sharded_candidate_spans(text, extractors, post_process, verbose)
+        if key:
+            get_candidate_cache().put(key, spans)
+    else:
+        # Step 1: Process with spaCy
+        t1 = time.perf_counter()
+        doc = process_text(text)
+        elapsed = time.perf_counter() - t1
+        STAGE_LATENCY.observe(elapsed, stage="parse")
+        if verbose:
+            print(f"  spaCy processing: {elapsed:.3f}s")
+        
+        spans = candidate_spans(doc, extractors, post_process, verbose)
+        if key:
+            get_candidate_cache().put(key, spans)
     
-    # Step 2: Extract phrases
-    if extractors is None:
-        extractors = get_default_extractors()
+    keyphrases = sample_spans(spans, p, seed, verbose)
     
-    t2 = time.time()
-    phrases = apply_extractors(doc, extractors)
+    elapsed = time.perf_counter() - total_start
+    STAGE_LATENCY.observe(elapsed, stage="total")
     if verbose:
-        print(f"  Extraction: {time.time()-t2:.3f}s ({len(phrases)} raw phrases)")
+        print(f"  TOTAL: {elapsed:.3f}s")
     
-    # Step 3: Post-process
-    if post_process:
-        t3 = time.time()
-        phrases = post_process_phrases(phrases)
-        if verbose:
-            print(f"  Post-processing: {time.time()-t3:.3f}s ({len(phrases)} after filter)")
+    return keyphrases
+
+
+def extract_keyphrases_batch(
+    texts: List[str],
+    ps: List[float] = None,
+    seeds: List[Optional[int]] = None,
+    extractors: List[Callable] = None,
+    post_process: bool = True,
+    batch_size: int = PIPE_BATCH_SIZE,
+    n_process: int = PIPE_N_PROCESS,
+) -> List[List[List[int]]]:
+    """
+    Extract key phrases from many texts with a single nlp.pipe pass.
     
-    # Step 4: Sample
-    if p < 1.0:
-        t4 = time.time()
-        phrases = random_sample_phrases(phrases, p)
-        phrases = sort_phrases_by_position(phrases)
-        if verbose:
-            print(f"  Sampling: {time.time()-t4:.3f}s ({len(phrases)} after sample)")
+    Texts already in the candidate cache are not sent to spaCy.
     
-    if verbose:
-        print(f"  TOTAL: {time.time()-total_start:.3f}s")
+    Args:
+        texts: Input texts
+        ps: Per-text sampling percentages (default: DEFAULT_SAMPLING_PERCENTAGE)
+        seeds: Per-text sampling seeds (optional)
+        extractors: Custom extraction functions (optional)
+        post_process: Apply filtering/deduplication
+        batch_size: Number of texts spaCy buffers per batch
+        n_process: Number of spaCy worker processes
     
-    return [[p["start"], p["end"]] for p in phrases]
+    Returns:
+        One list of [start, end] index pairs per text, in input order
+    """
+    if ps is None:
+        ps = [DEFAULT_SAMPLING_PERCENTAGE] * len(texts)
+    if seeds is None:
+        seeds = [None] * len(texts)
+    if len(ps) != len(texts) or len(seeds) != len(texts):
+        raise ValueError("ps and seeds must have one entry per text")
+    
+    cache = get_candidate_cache()
+    results = [[] for _ in texts]
+    keys = {}
+    pending = []
+    for i, text in enumerate(texts):
+        # Blank texts are skipped so they never reach spaCy; their slot stays []
+        if not text or not text.strip():
+            continue
+        key = _cache_key(text, extractors, post_process)
+        spans = cache.get(key) if key else None
+        if spans is not None:
+            results[i] = sample_spans(spans, ps[i], seeds[i])
+        elif is_large_text(text):
+            spans = sharded_candidate_spans(text, extractors, post_process)
+            if key:
+                cache.put(key, spans)
+            results[i] = sample_spans(spans, ps[i], seeds[i])
+        else:
+            keys[i] = key
+            pending.append(i)
+    
+    docs = get_nlp_model().pipe(
+        (texts[i] for i in pending),
+        batch_size=batch_size,
+        n_process=n_process,
+    )
+    parse_start = time.perf_counter()
+    for i, doc in zip(pending, docs):
+        # nlp.pipe parses lazily, so the wait for each doc is its parse time
+        STAGE_LATENCY.observe(time.perf_counter() - parse_start, stage="parse")
+        spans = candidate_spans(doc, extractors, post_process)
+        if keys[i]:
+            cache.put(keys[i], spans)
+        results[i] = sample_spans(spans, ps[i], seeds[i])
+        parse_start = time.perf_counter()
+    return results
+
 
+def extract_block(offset: int, text: str, post_process: bool = True) -> List[Tuple[int, int]]:
+    """
+    Candidate spans for one block of a larger text, shifted to global offsets
+    and sorted by start. Runs in the extraction executor, so it only takes
+    picklable arguments.
+    """
+    t1 = time.perf_counter()
+    doc = process_text(text)
+    STAGE_LATENCY.observe(time.perf_counter() - t1, stage="parse")
+    spans = candidate_spans(doc, post_process=post_process)
+    if not post_process:
+        spans = sorted(spans, key=lambda span: (span[0], span[0] - span[1]))
+    return [(start + offset, end + offset) for start, end in spans]
+
+
+async def stream_keyphrases(
+    text: str,
+    p: float = DEFAULT_SAMPLING_PERCENTAGE,
+    seed: Optional[int] = None,
+    post_process: bool = True,
+    block_chars: int = STREAM_BLOCK_CHARS,
+    run: Callable[..., Awaitable[Any]] = None,
+) -> AsyncIterator[List[List[int]]]:
+    """
+    Yield the [start, end] key phrases of each block of paragraphs, in text
+    order (one list per block, possibly empty).
+    
+    Each block is parsed with extract_block through `run(fn, *args)` (e.g.
+    ExtractionExecutor.run; a worker thread by default), and the next block
+    is already parsing while the caller handles the current one. Work and
+    memory are bounded by the block size rather than the document: overlap
+    removal carries only the last span's end across blocks, and sampling
+    keeps each span with probability p (see SpanStreamSampler), so the
+    result differs from extract_keyphrases, which samples exactly
+    int(n * p) spans from the full list. Entities spanning a paragraph break
+    are not found.
+    """
+    if run is None:
+        run = asyncio.to_thread
+    sampler = SpanStreamSampler(p, seed, remove_overlaps=post_process and REMOVE_OVERLAPS)
+    blocks = iter_text_blocks(text, block_chars)
+    
+    def parse_next() -> Optional[asyncio.Future]:
+        block = next(blocks, None)
+        if block is None:
+            return None
+        return asyncio.ensure_future(run(extract_block, *block, post_process))
+    
+    pending = parse_next()
+    try:
+        while pending is not None:
+            spans = await pending
+            pending = parse_next()
+            yield sampler.feed(spans)
+    finally:
+        if pending is not None:
+            pending.cancel()
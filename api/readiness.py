@@ -0,0 +1,95 @@
+"""Startup warm-up tracking and the GET /ready readiness probe."""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+
+class Readiness:
+    """
+    Runs named warm-up steps in the background and reports when all have finished.
+
+    /health answers as soon as the app is serving; /ready returns 503 until
+    every step has completed, so a load balancer or autoscaler only routes
+    traffic to a warm instance. A failed step keeps the instance not ready.
+    """
+
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable[[], Awaitable[Any]]]] = []
+        self._durations: Dict[str, float] = {}
+        self._error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._started = None
+        self._finished = None
+
+    def add_step(self, name: str, step: Callable[[], Awaitable[Any]]) -> None:
+        """Register an async warm-up step; steps run in registration order."""
+        self._steps.append((name, step))
+
+    @property
+    def ready(self) -> bool:
+        return self._finished is not None and self._error is None
+
+    async def _run(self) -> None:
+        self._started = time.perf_counter()
+        for name, step in self._steps:
+            step_start = time.perf_counter()
+            try:
+                await step()
+            except Exception as e:
+                self._error = f"{name}: {e}"
+                logging.exception("Warm-up step %s failed", name)
+                return
+            self._durations[name] = time.perf_counter() - step_start
+            logging.info("Warm-up step %s finished in %.3fs", name, self._durations[name])
+        self._finished = time.perf_counter()
+
+    def start(self) -> None:
+        """Start warm-up as a background task on the running loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def wait(self) -> bool:
+        """Wait for warm-up to finish; returns whether the app is ready."""
+        if self._task is not None:
+            await self._task
+        return self.ready
+
+    async def stop(self) -> None:
+        """Cancel warm-up if it is still running (shutdown during startup)."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> Dict[str, Any]:
+        status = {
+            "ready": self.ready,
+            "steps": {
+                name: (
+                    round(self._durations[name] * 1000, 1) if name in self._durations
+                    else "failed" if self._error and self._error.startswith(f"{name}:")
+                    else "pending"
+                )
+                for name, _ in self._steps
+            },
+        }
+        if self._finished is not None:
+            status["warmup_ms"] = round((self._finished - self._started) * 1000, 1)
+        if self._error:
+            status["error"] = self._error
+        return status
+
+
+def install_readiness(app: FastAPI, readiness: Readiness) -> None:
+    """Add GET /ready: 200 once warm-up has finished, 503 (with progress) before."""
+
+    @app.get("/ready")
+    async def ready() -> JSONResponse:
+        return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
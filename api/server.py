@@ -1,23 +1,83 @@
 """FastAPI server for key-phrase extraction."""
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+import time
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, Awaitable, Dict, List, Optional
 import uvicorn
 
-from api.keyphrase_extractor import extract_keyphrases
+from api.keyphrase_extractor import (
+    extract_keyphrases,
+    extract_keyphrases_batch,
+    profile_parse,
+    shutdown_shard_pool,
+    stream_keyphrases,
+)
+from api.executor import (
+    ExecutorBusyError,
+    ExtractionTimeoutError,
+    get_executor,
+    shutdown_executor,
+    warm_up_executor,
+)
+from api.batching import get_batcher, shutdown_batcher
+from api.cache import get_candidate_cache
+from api.metrics import REGISTRY, install_metrics
+from api.readiness import Readiness, install_readiness
+from api.config import (
+    MAX_BATCH_ITEMS,
+    MICROBATCH_ENABLED,
+    REDACTION_BATCH_FRACTION,
+    WARMUP_ENABLED,
+)
+from api.utils import build_redaction_schedule
+from api.encoding import (
+    JSON,
+    NDJSON,
+    OCTET_STREAM,
+    encode_delta,
+    encode_int32,
+    encode_json,
+    encode_ndjson,
+    negotiate_encoding,
+)
 
 
 class TextRequest(BaseModel):
     """Text input with optional sampling parameters."""
     text: str = Field(..., min_length=1)
     p: float = Field(default=1.0, ge=0.0, le=1.0)
+    seed: Optional[int] = None
+    schedule: bool = False
+    batch_fraction: float = Field(default=REDACTION_BATCH_FRACTION, gt=0.0, le=1.0)
+
+
+class BatchTextItem(BaseModel):
+    """One text of a batch: text and sampling parameters only (schedule etc. are rejected with 422)."""
+    model_config = ConfigDict(extra="forbid")
+
+    text: str = Field(..., min_length=1)
+    p: float = Field(default=1.0, ge=0.0, le=1.0)
+    seed: Optional[int] = None
+
+
+class BatchTextRequest(BaseModel):
+    """Batch of texts, each with its own sampling parameters."""
+    items: List[BatchTextItem] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
 
 
 class ExtractionResponse(BaseModel):
-    """Extraction response with keyphrases."""
+    """Extraction response with keyphrases and, if requested, a redaction schedule."""
     keyphrases: List[List[int]]
+    schedule: Optional[List[List[int]]] = None
+
+
+class BatchExtractionResponse(BaseModel):
+    """Batch extraction response, one keyphrase list per item in request order."""
+    results: List[List[List[int]]]
 
 
 class HealthResponse(BaseModel):
@@ -26,10 +86,35 @@ class HealthResponse(BaseModel):
     message: str
 
 
+readiness = Readiness()
+if WARMUP_ENABLED:
+    readiness.add_step("spacy", warm_up_executor)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the extraction executor on startup and release it on shutdown.
+    
+    spaCy is loaded and warmed in the background, so /health answers right
+    away while /ready returns 503 until the model is warm.
+    """
+    get_executor()
+    if MICROBATCH_ENABLED:
+        get_batcher().start()
+    readiness.start()
+    yield
+    await readiness.stop()
+    await shutdown_batcher()
+    shutdown_executor()
+    shutdown_shard_pool()
+
+
 app = FastAPI(
     title="Key-Phrase Extraction API",
     description="Extract key phrases from text and return their indices",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -40,6 +125,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# GET /ready: 503 until warm-up has finished
+install_readiness(app, readiness)
+
+# GET /metrics: request counts, in-flight requests, route and stage latency
+install_metrics(app)
+REGISTRY.gauge(
+    "extraction_executor_pending", "Extractions running or queued in the executor",
+    function=lambda: get_executor().stats()["pending"],
+)
+REGISTRY.gauge(
+    "candidate_cache_bytes", "Approximate size of the candidate span cache",
+    function=lambda: get_candidate_cache().stats()["bytes"],
+)
+REGISTRY.gauge(
+    "candidate_cache_hit_ratio", "Candidate cache hits / lookups since startup",
+    function=lambda: get_candidate_cache().stats()["hit_rate"],
+)
+
 
 @app.get("/", response_model=HealthResponse)
 async def root():
@@ -53,17 +156,141 @@ async def health_check():
     return {"status": "ok", "message": "healthy"}
 
 
-@app.post("/extract", response_model=ExtractionResponse)
-async def extract_phrases(request: TextRequest):
-    """Extract key phrases from text and return indices as [[start, end], ...]."""
+async def await_extraction(call: Awaitable) -> Any:
+    """Await an extraction call, mapping executor failures to HTTP errors."""
     try:
-        keyphrases = extract_keyphrases(
+        return await call
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExtractionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/extract", response_model=ExtractionResponse, response_model_exclude_none=True)
+async def extract_phrases(
+    request: TextRequest,
+    encoding: Optional[str] = None,
+    accept: Optional[str] = Header(default=None),
+):
+    """
+    Extract key phrases from text and return indices as [[start, end], ...].
+    
+    With schedule=true the response also carries the progressive redaction
+    order: keyphrase indices grouped into batches, shuffled with the request seed.
+    
+    Response encoding (?encoding=, or Accept: application/octet-stream):
+    - json (default): {"keyphrases": [...]} serialized without per-element validation
+    - int32: flat little-endian int32 array start0, end0, start1, end1, ...
+    - delta: delta-encoded offsets as zigzag LEB128 varints
+    Binary responses carry only the spans. X-Span-Count and X-Serialize-Ms
+    report the span count and encoding time.
+    """
+    try:
+        encoding = negotiate_encoding(encoding, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if request.schedule and encoding != "json":
+        raise HTTPException(status_code=400, detail="schedule is only available with JSON responses")
+    
+    if MICROBATCH_ENABLED:
+        call = get_batcher().submit(request.text, request.p, request.seed)
+    else:
+        call = get_executor().run(
+            extract_keyphrases,
             text=request.text,
             p=request.p,
+            seed=request.seed,
         )
-        return ExtractionResponse(keyphrases=keyphrases)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    keyphrases = await await_extraction(call)
+    
+    start = time.perf_counter()
+    if encoding == "int32":
+        body, media_type = encode_int32(keyphrases), OCTET_STREAM
+    elif encoding == "delta":
+        body, media_type = encode_delta(keyphrases), OCTET_STREAM
+    else:
+        payload = {"keyphrases": keyphrases}
+        if request.schedule:
+            payload["schedule"] = build_redaction_schedule(len(keyphrases), request.batch_fraction, request.seed)
+        body, media_type = encode_json(payload), JSON
+    headers = {
+        "X-Span-Count": str(len(keyphrases)),
+        "X-Serialize-Ms": f"{(time.perf_counter() - start) * 1000:.3f}",
+    }
+    if media_type == OCTET_STREAM:
+        headers["X-Span-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+@app.post("/extract/stream")
+async def extract_phrases_stream(request: TextRequest):
+    """
+    Stream key phrases as NDJSON, one [start, end] line per span, in text order.
+    
+    The text is parsed in blocks of whole paragraphs (STREAM_BLOCK_CHARS) and
+    each block's spans are sent as soon as it is done, with the next block
+    already parsing. Overlaps are removed across block boundaries and each
+    span is kept with probability p (seeded per request), so the span count
+    is p of the candidates on average rather than exactly. Errors before the
+    first block map to the usual status codes; a later failure ends the
+    stream with an {"error": ...} line.
+    """
+    if request.schedule:
+        raise HTTPException(status_code=400, detail="schedule is not available with streamed responses")
+    
+    blocks = stream_keyphrases(request.text, request.p, request.seed, run=get_executor().run)
+    # The first block is awaited before the response starts, so a full queue
+    # or timeout still becomes a 503/504 instead of a broken stream
+    first = await await_extraction(blocks.__anext__())
+    
+    async def lines():
+        kept = first
+        try:
+            while True:
+                if kept:
+                    yield encode_ndjson(kept)
+                try:
+                    kept = await blocks.__anext__()
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    yield encode_ndjson([{"error": str(e) or type(e).__name__}])
+                    return
+        finally:
+            await blocks.aclose()
+    
+    return StreamingResponse(lines(), media_type=NDJSON)
+
+
+@app.post("/extract/batch", response_model=BatchExtractionResponse)
+async def extract_phrases_batch(request: BatchTextRequest):
+    """Extract key phrases from many texts in one spaCy nlp.pipe pass."""
+    results = await await_extraction(get_executor().run(
+        extract_keyphrases_batch,
+        texts=[item.text for item in request.items],
+        ps=[item.p for item in request.items],
+        seeds=[item.seed for item in request.items],
+    ))
+    return BatchExtractionResponse(results=results)
+
+
+@app.post("/profile")
+async def profile_pipeline(request: TextRequest) -> Dict[str, Any]:
+    """Per-document parse time with the trimmed pipeline vs. every component enabled."""
+    return await await_extraction(get_executor().run(profile_parse, request.text))
+
+
+@app.get("/stats")
+async def extraction_stats() -> Dict[str, Any]:
+    """Executor queue, micro-batching and candidate cache statistics for tuning."""
+    stats = {"executor": get_executor().stats()}
+    # With the process backend each worker keeps its own cache; this is the server's
+    stats["candidate_cache"] = get_candidate_cache().stats()
+    if MICROBATCH_ENABLED:
+        stats["microbatch"] = get_batcher().stats()
+    return stats
 
 
 if __name__ == "__main__":
@@ -2,9 +2,16 @@
 
 import requests
 import json
+import os
 import sys
 import time
 
+# Keyphrase server URL (override with API_URL or --url)
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+# Reuse one keep-alive connection across calls
+session = requests.Session()
+
 
 def extract(text, p=0.5, verbose=False):
     """Call API and return keyphrases."""
@@ -15,8 +22,8 @@ def extract(text, p=0.5, verbose=False):
             print(f"[DEBUG] Sending request to API...")
         
         start = time.time()
-        response = requests.post(
-            "http://localhost:8000/extract",
+        response = session.post(
+            f"{API_URL}/extract",
             json={"text": text, "p": p}
         )
         elapsed = time.time() - start
@@ -95,8 +102,7 @@ def run_tests():
     
     total_elapsed = time.time() - total_start
     print(f"✓ Tests complete in {total_elapsed:.3f}s")
-    print(f"\nNote: First API call is slow due to model loading on server.")
-    print(f"Subsequent calls are fast.")
+    print(f"\nNote: the server loads spaCy at startup; GET /ready returns 200 once it is warm.")
 
 
 if __name__ == "__main__":
@@ -107,11 +113,14 @@ if __name__ == "__main__":
     for i, arg in enumerate(sys.argv):
         if arg == "-p" and i + 1 < len(sys.argv):
             p = float(sys.argv[i + 1])
+        if arg == "--url" and i + 1 < len(sys.argv):
+            API_URL = sys.argv[i + 1].rstrip("/")
     
     if "-i" in sys.argv:
         interactive_mode(p=p, verbose=verbose)
     else:
         run_tests()
         print("\nRun with -i for interactive mode: python test_api.py -i")
-        print("Options: -v (verbose), -p <value> (sampling, default 0.3)")
+        print("Options: -v (verbose), -p <value> (sampling, default 0.3), --url <server>")
+        print("Load testing: python loadtest.py extract (from the repository root)")
 
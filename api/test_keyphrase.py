@@ -1,6 +1,9 @@
 """Test and demo key-phrase extraction."""
 
+import keyphrase_extractor
+from api.executor import ExtractionExecutor
 from keyphrase_extractor import extract_keyphrases
+import asyncio
 import sys
 import time
 
@@ -69,6 +72,100 @@ def test_sampling():
     return True
 
 
+def test_cache():
+    """Repeat requests reuse cached candidates and only re-sample."""
+    text = "Tim Cook announced the new iPhone at Apple Park in Cupertino."
+    
+    start = time.time()
+    first = extract_keyphrases(text, p=0.5, seed=1)
+    cold = time.time() - start
+    
+    start = time.time()
+    second = extract_keyphrases(text, p=0.5, seed=1)
+    warm = time.time() - start
+    
+    print("Test: Candidate Cache")
+    print(f"cold: {cold:.4f}s, warm: {warm:.4f}s")
+    
+    assert first == second, "Cached result should match"
+    assert len(extract_keyphrases(text, p=1.0)) >= len(first), "Re-sampling uses full candidate set"
+
+    # A changed extraction setting gets its own key, so cached candidates are not reused
+    key = keyphrase_extractor._cache_key(text, None, True)
+    saved = keyphrase_extractor.MIN_PHRASE_LENGTH
+    keyphrase_extractor.MIN_PHRASE_LENGTH = 5
+    try:
+        assert keyphrase_extractor._cache_key(text, None, True) != key, "Key should track the setting"
+        misses = keyphrase_extractor.get_candidate_cache().stats()["misses"]
+        extract_keyphrases(text, p=1.0)
+        assert keyphrase_extractor.get_candidate_cache().stats()["misses"] == misses + 1, "Should miss the cache"
+    finally:
+        keyphrase_extractor.MIN_PHRASE_LENGTH = saved
+    print("✓ Cache works\n")
+    return True
+
+
+def test_sharding():
+    """Sharded extraction returns the same spans as a single parse."""
+    paragraph = (
+        "Apple Inc. was founded by Steve Jobs in Cupertino, California. "
+        "Microsoft Corporation, founded by Bill Gates, is in Redmond, Washington, and "
+        + "its engineers and researchers work on cloud computing, " * 8
+        + "while Tim Cook announced the new iPhone at Apple Park.\n\n"
+    )
+    text = paragraph * 10
+
+    keyphrase_extractor.get_candidate_cache().clear()
+    single = extract_keyphrases(text, p=1.0)
+
+    # Force small shards, including cuts inside a long sentence
+    saved = keyphrase_extractor.SHARD_THRESHOLD_CHARS, keyphrase_extractor.SHARD_MAX_CHARS
+    keyphrase_extractor.SHARD_THRESHOLD_CHARS, keyphrase_extractor.SHARD_MAX_CHARS = 500, 300
+    try:
+        keyphrase_extractor.get_candidate_cache().clear()
+        assert keyphrase_extractor.is_large_text(text)
+        start = time.time()
+        sharded = extract_keyphrases(text, p=1.0)
+        elapsed = time.time() - start
+    finally:
+        keyphrase_extractor.SHARD_THRESHOLD_CHARS, keyphrase_extractor.SHARD_MAX_CHARS = saved
+        keyphrase_extractor.get_candidate_cache().clear()
+        keyphrase_extractor.shutdown_shard_pool()
+
+    print("Test: Sharded Extraction")
+    print(f"{len(text)} chars: {len(single)} spans single, {len(sharded)} sharded in {elapsed:.3f}s")
+
+    assert len(single) > 0, "Should find keyphrases"
+    assert sharded == single, "Sharded spans should match a single parse"
+    print("✓ Sharding matches a single parse\n")
+    return True
+
+
+def _shard_pool_after_large_text(text: str) -> bool:
+    """Executor worker: extract a text over the shard threshold; was a shard pool started?"""
+    # The executor's initializer configured the module under its api. name
+    from api import keyphrase_extractor as worker_extractor
+    worker_extractor.SHARD_THRESHOLD_CHARS, worker_extractor.SHARD_MAX_CHARS = 500, 300
+    assert worker_extractor.is_large_text(text)
+    worker_extractor.extract_keyphrases(text, p=1.0)
+    return worker_extractor._shard_pool is not None
+
+
+def test_process_backend_sharding():
+    """Process-backend executor workers shard in-process instead of starting their own shard pools."""
+    text = "Apple Inc. was founded by Steve Jobs in Cupertino, California.\n\n" * 20
+    executor = ExtractionExecutor(backend="process", workers=1)
+    try:
+        started_pool = asyncio.run(executor.run(_shard_pool_after_large_text, text))
+    finally:
+        executor.shutdown()
+
+    print("Test: Process Backend Sharding")
+    assert not started_pool, "Executor workers must not start a nested shard pool"
+    print("✓ Process workers shard in-process\n")
+    return True
+
+
 def interactive_mode():
     """Interactive extraction mode."""
     print("\n=== Interactive Key-Phrase Extraction ===")
@@ -115,7 +212,7 @@ def run_tests():
     print("="*60 + "\n")
     
     total_start = time.time()
-    tests = [test_basic, test_indices, test_sampling]
+    tests = [test_basic, test_indices, test_sampling, test_cache, test_sharding, test_process_backend_sharding]
     passed = 0
     
     try:
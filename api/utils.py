@@ -1,6 +1,10 @@
 """Pure utility functions for text processing."""
 
-from typing import List, Dict, Any
+import math
+import random
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
 
 
 def create_phrase_object(phrase: str, start: int, end: int, phrase_type: str = "unknown") -> Dict[str, Any]:
@@ -68,8 +72,6 @@ def filter_excluded_words(phrases: List[Dict[str, Any]], excluded_words: set) ->
 
 def random_sample_phrases(phrases: List[Dict[str, Any]], p: float, seed: int = None) -> List[Dict[str, Any]]:
     """Randomly sample p% of phrases. Same seed = same results."""
-    import random
-    
     if not 0.0 <= p <= 1.0:
         raise ValueError(f"p must be between 0.0 and 1.0, got {p}")
     
@@ -80,11 +82,256 @@ def random_sample_phrases(phrases: List[Dict[str, Any]], p: float, seed: int = N
     
     num_to_sample = max(1, int(len(phrases) * p))
     
-    if seed is not None:
-        random.seed(seed)
-    
     if num_to_sample >= len(phrases):
         return phrases
     
-    return random.sample(phrases, num_to_sample)
+    # Per-call RNG: reseeding the global random module is unsafe across concurrent requests
+    return random.Random(seed).sample(phrases, num_to_sample)
+
+
+def build_redaction_schedule(num_spans: int, batch_fraction: float, seed: int = None) -> List[List[int]]:
+    """
+    Group span indices into ordered redaction batches.
+    
+    Spans are shuffled with a per-call RNG (same seed = same schedule) and cut
+    into batches of ceil(num_spans * batch_fraction), at least one span each.
+    """
+    if not 0.0 < batch_fraction <= 1.0:
+        raise ValueError(f"batch_fraction must be in (0.0, 1.0], got {batch_fraction}")
+    
+    order = list(range(num_spans))
+    random.Random(seed).shuffle(order)
+    batch_size = max(1, math.ceil(num_spans * batch_fraction))
+    return [order[i:i + batch_size] for i in range(0, num_spans, batch_size)]
+
+
+class PhraseTable:
+    """
+    Columnar phrase candidates: NumPy arrays of starts, ends and lengths plus
+    a list of texts, instead of one five-key dict per phrase. The default
+    extractors fill it straight from spaCy spans (from_spans); custom
+    extractors' phrase objects go through from_phrases.
+    """
+
+    __slots__ = ("texts", "starts", "ends", "lengths")
+
+    def __init__(self, texts: List[str], starts, ends):
+        self.texts = texts
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+
+    @classmethod
+    def from_spans(cls, spans: Iterable[Any], offset: int = 0) -> "PhraseTable":
+        """Build a table from spaCy spans (noun chunks, entities), shifting offsets by offset."""
+        texts, starts, ends = [], [], []
+        for span in spans:
+            texts.append(span.text)
+            starts.append(span.start_char + offset)
+            ends.append(span.end_char + offset)
+        return cls(texts, starts, ends)
+
+    @classmethod
+    def from_phrases(cls, phrases: List[Dict[str, Any]], offset: int = 0) -> "PhraseTable":
+        """Build a table from phrase objects (see create_phrase_object)."""
+        return cls(
+            [p["phrase"] for p in phrases],
+            [p["start"] + offset for p in phrases],
+            [p["end"] + offset for p in phrases],
+        )
+
+    @classmethod
+    def concat(cls, tables: List["PhraseTable"]) -> "PhraseTable":
+        """One table holding the rows of tables, in order."""
+        if not tables:
+            return cls([], [], [])
+        return cls(
+            [text for table in tables for text in table.texts],
+            np.concatenate([table.starts for table in tables]),
+            np.concatenate([table.ends for table in tables]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def starting_in(self, start: int, end: int) -> "PhraseTable":
+        """The rows whose start offset falls in [start, end)."""
+        index = np.flatnonzero((self.starts >= start) & (self.starts < end))
+        return PhraseTable([self.texts[i] for i in index.tolist()], self.starts[index], self.ends[index])
+
+    def spans(self, index: np.ndarray = None) -> List[Tuple[int, int]]:
+        """(start, end) pairs for the given row indices (all rows by default)."""
+        if index is None:
+            return list(zip(self.starts.tolist(), self.ends.tolist()))
+        return list(zip(self.starts[index].tolist(), self.ends[index].tolist()))
+
+
+def post_process_columns(
+    table: PhraseTable,
+    excluded_words: set,
+    min_length: int,
+    max_length: int,
+    remove_overlaps: bool = True,
+) -> np.ndarray:
+    """
+    Columnar equivalent of deduplicate_phrases -> filter_excluded_words ->
+    filter_by_length -> remove_overlapping_phrases -> sort_phrases_by_position.
+    
+    Returns the indices of the surviving rows, in output order. One stable
+    lexsort by (start, longest first) serves every stage: duplicate spans end
+    up adjacent, so only rows sharing a span have their texts compared, and
+    overlap removal is a single greedy pass over the sorted survivors.
+    """
+    n = len(table)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    
+    starts, ends, texts = table.starts, table.ends, table.texts
+    order = np.lexsort((-ends, starts))
+    sorted_starts, sorted_ends = starts[order], ends[order]
+    same_span = np.zeros(n, dtype=bool)
+    same_span[1:] = (sorted_starts[1:] == sorted_starts[:-1]) & (sorted_ends[1:] == sorted_ends[:-1])
+    
+    keep = (table.lengths >= min_length) & (table.lengths <= max_length)
+    
+    # Dedupe: the first row (in input order) of each (start, end, lowercase text) wins
+    in_group = same_span.copy()
+    in_group[:-1] |= same_span[1:]
+    seen = set()
+    for position in np.flatnonzero(in_group).tolist():
+        if not same_span[position]:
+            seen = set()
+        row = int(order[position])
+        key = texts[row].lower()
+        if key in seen:
+            keep[row] = False
+        else:
+            seen.add(key)
+    
+    candidates = np.flatnonzero(keep)
+    excluded = np.fromiter(
+        (texts[i].lower().strip() in excluded_words for i in candidates.tolist()),
+        dtype=bool,
+        count=len(candidates),
+    )
+    keep[candidates[excluded]] = False
+    
+    if not remove_overlaps:
+        index = np.flatnonzero(keep)
+        return index[np.argsort(starts[index], kind="stable")]
+    
+    survivors = order[keep[order]]
+    selected = []
+    last_end = -1
+    for row, start, end in zip(survivors.tolist(), starts[survivors].tolist(), ends[survivors].tolist()):
+        if start >= last_end:
+            selected.append(row)
+            last_end = end
+    # Greedy selection visits rows by start, so the result is already position-sorted
+    return np.asarray(selected, dtype=np.int64)
+
+
+def _find_shard_cut(text: str, start: int, end: int) -> int:
+    """Best cut position in text[start:end]: paragraph, then sentence, then word boundary."""
+    cut = text.rfind("\n\n", start, end)
+    if cut > start:
+        return cut + 2
+    for sentence_end in (". ", "! ", "? ", ".\n", "!\n", "?\n"):
+        cut = max(cut, text.rfind(sentence_end, start, end))
+    if cut > start:
+        return cut + 2
+    cut = max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+    if cut > start:
+        return cut + 1
+    return end
+
+
+def iter_text_blocks(text: str, max_chars: int) -> Iterator[Tuple[int, str]]:
+    """Lazily yield (offset, block) pieces of at most max_chars, cutting at natural boundaries."""
+    start = 0
+    while start < len(text):
+        end = start + max_chars
+        if end < len(text):
+            end = _find_shard_cut(text, start, end)
+        yield start, text[start:end]
+        start = end
 
+
+def split_text_into_shards(text: str, max_chars: int) -> List[Tuple[int, str]]:
+    """Split text into (offset, shard) pieces of at most max_chars, cutting at natural boundaries."""
+    return list(iter_text_blocks(text, max_chars))
+
+
+def _find_context_start(text: str, start: int, end: int) -> int:
+    """Earliest natural boundary in text[start:end]: paragraph, then sentence, then word."""
+    if start == 0:
+        return 0
+    cut = text.find("\n\n", start, end)
+    if cut != -1:
+        return cut + 2
+    cuts = [text.find(sentence_end, start, end) for sentence_end in (". ", "! ", "? ", ".\n", "!\n", "?\n")]
+    cuts = [cut for cut in cuts if cut != -1]
+    if cuts:
+        return min(cuts) + 2
+    cuts = [cut for cut in (text.find(" ", start, end), text.find("\n", start, end)) if cut != -1]
+    if cuts:
+        return min(cuts) + 1
+    return end
+
+
+def add_shard_context(
+    text: str, shards: List[Tuple[int, str]], context_chars: int
+) -> List[Tuple[int, str, int, int]]:
+    """
+    Widen each shard to (offset, window, own_start, own_end) for parsing.
+    
+    The window adds up to context_chars of neighbouring text on each side,
+    trimmed to natural boundaries, so sentences cut by a shard boundary are
+    parsed whole. own_start/own_end are the shard's own range in the full
+    text; a phrase belongs to the shard whose range holds its start.
+    """
+    windows = []
+    for own_start, shard in shards:
+        own_end = own_start + len(shard)
+        start = _find_context_start(text, max(0, own_start - context_chars), own_start)
+        end = min(len(text), own_end + context_chars)
+        if end < len(text):
+            end = _find_shard_cut(text, own_end, end)
+        windows.append((start, text[start:end], own_start, own_end))
+    return windows
+
+
+class SpanStreamSampler:
+    """
+    Incremental overlap removal and sampling for spans that arrive in text order.
+    
+    Only the end of the last kept span is remembered, so memory stays constant
+    however many spans pass through. Sampling is a Bernoulli draw per span from
+    a per-stream RNG (same seed = same spans): each span is kept with
+    probability p, so the kept fraction is p on average rather than exactly
+    int(n * p) as in random_sample_phrases, which needs the whole list up front.
+    """
+
+    def __init__(self, p: float, seed: Optional[int] = None, remove_overlaps: bool = True):
+        if not 0.0 <= p <= 1.0:
+            raise ValueError(f"p must be between 0.0 and 1.0, got {p}")
+        self.p = p
+        self.remove_overlaps = remove_overlaps
+        self._rng = random.Random(seed)
+        self._last_end = -1
+        self.seen = 0
+        self.kept = 0
+    
+    def feed(self, spans: Iterable[Tuple[int, int]]) -> List[List[int]]:
+        """Filter the next spans (sorted by start) and return the kept ones as [start, end]."""
+        kept = []
+        for start, end in spans:
+            if self.remove_overlaps:
+                if start < self._last_end:
+                    continue
+                self._last_end = end
+            self.seen += 1
+            if self._rng.random() < self.p:
+                kept.append([start, end])
+        self.kept += len(kept)
+        return kept
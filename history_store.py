@@ -0,0 +1,160 @@
+"""Bounded conversation history: per-session ring buffers under a global byte cap."""
+import json, logging, sys, threading, time
+from collections import deque
+
+# Rough per-entry bookkeeping cost (entry object, deque slots)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class HistoryEntry:
+    __slots__ = ('session_id', 'mode', 'user', 'assistant', 'timestamp', 'size', 'evicted')
+
+    def __init__(self, session_id, mode, user, assistant):
+        self.session_id = session_id
+        self.mode = mode
+        self.user = user
+        self.assistant = assistant
+        self.timestamp = time.time()
+        self.size = (sys.getsizeof(user) + sys.getsizeof(assistant)
+                     + sys.getsizeof(mode) + sys.getsizeof(session_id) + ENTRY_OVERHEAD_BYTES)
+        self.evicted = False
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "mode": self.mode,
+            "user": self.user,
+            "assistant": self.assistant,
+            "timestamp": self.timestamp,
+        }
+
+
+class HistoryStore:
+    """
+    Keeps the last `max_per_session` exchanges of each session, and drops the
+    globally oldest exchanges once the total exceeds `max_bytes`, so memory
+    stays flat however long the server runs.
+
+    If `path` is set, every exchange is also appended to that JSONL file.
+    append() only buffers the line; a background thread (started on the first
+    append, so constructing a store has no side effects) writes the buffer
+    every `flush_interval` seconds, or as soon as `flush_every` lines are
+    waiting. Callers on the event loop never touch the file.
+    """
+
+    def __init__(self, max_per_session: int = 50, max_bytes: int = 16 * 1024 * 1024,
+                 path: str = None, flush_every: int = 32, flush_interval: float = 1.0):
+        self.max_per_session = max_per_session
+        self.max_bytes = max_bytes
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._sessions = {}  # session_id -> deque of HistoryEntry, oldest first
+        self._order = deque()  # every entry in insertion order (evicted ones are skipped)
+        self._live = 0
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+        self._pending_lines = []
+        self._flush_lock = threading.Lock()  # keeps concurrent flushes in order
+        self._wake = threading.Event()
+        self._writer = None
+        self._closed = False
+
+    def append(self, session_id: str, user: str, assistant: str, mode: str) -> None:
+        """Record one exchange for a session."""
+        entry = HistoryEntry(session_id, mode, user, assistant)
+        with self._lock:
+            session = self._sessions.setdefault(session_id, deque())
+            session.append(entry)
+            self._order.append(entry)
+            self._live += 1
+            self._bytes += entry.size
+            if len(session) > self.max_per_session:
+                self._evict(session.popleft())
+            while self._bytes > self.max_bytes and self._live > 0:
+                self._evict_oldest()
+            self._compact()
+            if self.path and not self._closed:
+                self._pending_lines.append(json.dumps(entry.to_dict()))
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+                    self._writer.start()
+                if len(self._pending_lines) >= self.flush_every:
+                    self._wake.set()
+
+    def _write_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _evict(self, entry: HistoryEntry) -> None:
+        # Release the text now; the ghost in _order is skipped or compacted later
+        entry.evicted = True
+        entry.user = entry.assistant = None
+        self._live -= 1
+        self._bytes -= entry.size
+        self._evictions += 1
+        session = self._sessions.get(entry.session_id)
+        if session is not None and not session:
+            del self._sessions[entry.session_id]
+
+    def _evict_oldest(self) -> None:
+        while self._order:
+            entry = self._order.popleft()
+            if not entry.evicted:
+                # The globally oldest live entry is also the oldest in its session
+                self._sessions[entry.session_id].popleft()
+                self._evict(entry)
+                return
+
+    def _compact(self) -> None:
+        # Entries dropped by the per-session cap linger in _order; rebuild it
+        # once they outnumber live entries so it stays O(live) in size
+        if len(self._order) > 2 * self._live + 64:
+            self._order = deque(e for e in self._order if not e.evicted)
+
+    def get(self, session_id: str) -> list:
+        """Exchanges for a session, oldest first."""
+        with self._lock:
+            return [e.to_dict() for e in self._sessions.get(session_id, ())]
+
+    def flush(self) -> None:
+        """Write buffered entries to the JSONL file now (blocking)."""
+        with self._flush_lock:
+            with self._lock:
+                lines, self._pending_lines = self._pending_lines, []
+            if not lines or not self.path:
+                return
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lines) + '\n')
+            except OSError:
+                logging.exception('Failed to persist history to %s', self.path)
+
+    def close(self) -> None:
+        """Stop the writer thread and write whatever is still buffered."""
+        with self._lock:
+            self._closed = True
+            writer = self._writer
+        self._wake.set()
+        if writer is not None:
+            writer.join(timeout=10)
+        self.flush()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "entries": self._live,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_per_session": self.max_per_session,
+                "evictions": self._evictions,
+                "pending_writes": len(self._pending_lines),
+                "path": self.path,
+            }
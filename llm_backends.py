@@ -0,0 +1,242 @@
+"""
+LLM backends for model.py, chosen with LLM_BACKEND.
+
+- 'gemini' (default): Google GenAI client
+- 'fake': deterministic offline echo with configurable latency, streaming
+  rate and error injection, for benchmarks and load tests
+- 'package.module:ClassName': any other LLMBackend subclass
+"""
+import asyncio, importlib, logging, math, os, random, threading, time
+
+
+class LLMError(RuntimeError):
+    """Raised by a backend when a generation fails; transient errors are worth retrying."""
+
+    def __init__(self, message: str, transient: bool = False):
+        super().__init__(message)
+        self.transient = transient
+
+
+# HTTP status codes that signal throttling or a temporary upstream fault
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMBackend:
+    """
+    Interface model.py talks to. Subclasses implement generate (blocking),
+    agenerate (async) and astream (async iterator of text chunks).
+    """
+
+    name = 'base'
+    model = None
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def astream(self, prompt: str):
+        # Default: one chunk with the whole response
+        yield await self.agenerate(prompt)
+
+    def describe(self) -> dict:
+        """Settings worth reporting (health checks, benchmark output)."""
+        return {"backend": self.name, "model": self.model}
+
+    def is_transient(self, error: Exception) -> bool:
+        """Whether a failed call may succeed if retried (throttling, timeouts, 5xx)."""
+        if isinstance(error, LLMError):
+            return error.transient
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _response_text(response) -> str:
+    # response object shape may vary; attempt to read text
+    return getattr(response, 'text', None) or getattr(response, 'content', None) or str(response)
+
+
+class GeminiBackend(LLMBackend):
+    """Google GenAI (Gemini) client; the SDK is imported only when this backend is built."""
+
+    name = 'gemini'
+
+    def __init__(self, api_key: str, model: str = 'gemini-2.5-flash'):
+        if not api_key:
+            raise LLMError("GenAI client not configured (missing or invalid super_top_secret.txt)")
+        from google import genai
+        self.model = model
+        self._client = genai.Client(api_key=api_key)
+        logging.info('GenAI client initialized (masked key prefix: %s)', api_key[:8])
+
+    def generate(self, prompt: str) -> str:
+        return _response_text(self._client.models.generate_content(model=self.model, contents=prompt))
+
+    async def agenerate(self, prompt: str) -> str:
+        return _response_text(await self._client.aio.models.generate_content(model=self.model, contents=prompt))
+
+    def is_transient(self, error: Exception) -> bool:
+        # google.genai.errors.APIError carries the HTTP status as .code
+        if getattr(error, 'code', None) in TRANSIENT_STATUS_CODES:
+            return True
+        import httpx
+        return isinstance(error, httpx.TransportError) or super().is_transient(error)
+
+    async def astream(self, prompt: str):
+        stream = await self._client.aio.models.generate_content_stream(model=self.model, contents=prompt)
+        async for chunk in stream:
+            text = getattr(chunk, 'text', None)
+            if text:
+                yield text
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline stand-in: echoes the prompt back word by word (one word = one token).
+
+    Each call waits a time-to-first-token drawn from the latency distribution,
+    then produces tokens at tokens_per_sec. With error_rate > 0 a call fails
+    with a transient LLMError (like a 503 from a real service), either before
+    the first token or partway through a stream.
+    Draws come from one seeded RNG, so a run with a fixed seed and call order
+    is reproducible.
+
+    Distributions (mean latency_ms): 'fixed', 'uniform' (0 to 2x mean),
+    'exponential', 'lognormal' (sigma latency_sigma, long right tail).
+    """
+
+    name = 'fake'
+    DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+    def __init__(self, latency_ms: float = 0.0, distribution: str = 'fixed', latency_sigma: float = 0.5,
+                 tokens_per_sec: float = 100.0, error_rate: float = 0.0, seed: int = None,
+                 model: str = 'fake-echo'):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}; expected one of {self.DISTRIBUTIONS}")
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.seed = seed
+        self.model = model
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def describe(self) -> dict:
+        return {
+            **super().describe(),
+            "latency_ms": self.latency_ms,
+            "distribution": self.distribution,
+            "tokens_per_sec": self.tokens_per_sec,
+            "error_rate": self.error_rate,
+        }
+
+    @staticmethod
+    def _tokens(prompt: str) -> list:
+        # Deterministic output: echo the prompt back word by word
+        words = str(prompt).split(' ')
+        return [w if i == len(words) - 1 else w + ' ' for i, w in enumerate(words)]
+
+    def _plan(self, num_tokens: int) -> tuple:
+        """(seconds to first token, index of the token to fail at or None) for one call."""
+        with self._lock:
+            mean = self.latency_ms / 1000
+            if mean <= 0 or self.distribution == 'fixed':
+                first = max(mean, 0.0)
+            elif self.distribution == 'uniform':
+                first = self._rng.uniform(0, 2 * mean)
+            elif self.distribution == 'exponential':
+                first = self._rng.expovariate(1 / mean)
+            else:
+                # Lognormal with the requested mean
+                sigma = self.latency_sigma
+                first = self._rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+            fail_at = None
+            if self.error_rate and self._rng.random() < self.error_rate:
+                fail_at = self._rng.randrange(num_tokens + 1)
+        return first, fail_at
+
+    def _per_token(self) -> float:
+        return 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    @staticmethod
+    def _error(fail_at: int) -> LLMError:
+        return LLMError(f"Injected fake LLM error after {fail_at} tokens", transient=True)
+
+    def generate(self, prompt: str) -> str:
+        tokens = self._tokens(prompt)
+        first, fail_at = self._plan(len(tokens))
+        if fail_at is not None:
+            time.sleep(first + fail_at * self._per_token())
+            raise self._error(fail_at)
+        time.sleep(first + len(tokens) * self._per_token())
+        return ''.join(tokens)
+
+    async def agenerate(self, prompt: str) -> str:
+        tokens = self._tokens(prompt)
+        first, fail_at = self._plan(len(tokens))
+        if fail_at is not None:
+            await asyncio.sleep(first + fail_at * self._per_token())
+            raise self._error(fail_at)
+        await asyncio.sleep(first + len(tokens) * self._per_token())
+        return ''.join(tokens)
+
+    async def astream(self, prompt: str):
+        tokens = self._tokens(prompt)
+        first, fail_at = self._plan(len(tokens))
+        per_token = self._per_token()
+        loop = asyncio.get_running_loop()
+        # Sleep to an absolute schedule so timer overshoot doesn't accumulate
+        due = loop.time() + first
+        for i, token in enumerate(tokens):
+            if i == fail_at:
+                raise self._error(fail_at)
+            due += per_token
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield token
+        if fail_at == len(tokens):
+            raise self._error(fail_at)
+
+
+BACKENDS = {
+    'gemini': GeminiBackend,
+    'fake': FakeBackend,
+}
+
+
+def fake_settings_from_env() -> dict:
+    """FakeBackend settings from FAKE_LLM_* environment variables."""
+    seed = os.getenv('FAKE_LLM_SEED')
+    return {
+        "latency_ms": float(os.getenv('FAKE_LLM_LATENCY_MS', '0')),
+        "distribution": os.getenv('FAKE_LLM_LATENCY_DIST', 'fixed'),
+        "latency_sigma": float(os.getenv('FAKE_LLM_LATENCY_SIGMA', '0.5')),
+        "tokens_per_sec": float(os.getenv('FAKE_LLM_TOKENS_PER_SEC', '100')),
+        "error_rate": float(os.getenv('FAKE_LLM_ERROR_RATE', '0')),
+        "seed": int(seed) if seed else None,
+    }
+
+
+def create_backend(name: str, api_key: str = None, model: str = None) -> LLMBackend:
+    """
+    Build the backend selected by name: a key of BACKENDS or 'module:ClassName'.
+
+    Gemini needs api_key; the fake backend reads its settings from FAKE_LLM_*.
+    Custom classes are constructed with no arguments.
+    """
+    if name == 'gemini':
+        return GeminiBackend(api_key, model) if model else GeminiBackend(api_key)
+    if name == 'fake':
+        return FakeBackend(**fake_settings_from_env())
+    if ':' in name:
+        module_name, _, class_name = name.partition(':')
+        backend_class = getattr(importlib.import_module(module_name), class_name)
+        if not (isinstance(backend_class, type) and issubclass(backend_class, LLMBackend)):
+            raise ValueError(f"{name} is not an LLMBackend subclass")
+        return backend_class()
+    raise ValueError(f"Unknown LLM_BACKEND {name!r}; expected one of {sorted(BACKENDS)} or 'module:ClassName'")
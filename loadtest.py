@@ -0,0 +1,266 @@
+"""
+HTTP load generator for the transform API (main.py) and keyphrase API (api/server.py).
+
+    python loadtest.py extract --concurrency 32 --duration 30
+    python loadtest.py transform --rate 50 --requests 2000 --sizes 280:0.7,4000:0.3
+    python loadtest.py both --json results.json
+
+Requests go through one pooled keep-alive httpx client per target. With --rate
+the load is open-loop (requests start on a fixed schedule and latency is
+measured from the scheduled start, so a stalled server cannot hide queueing
+delay); without it each of --concurrency workers sends back-to-back.
+
+To load-test the transform server offline, start it with the fake backend:
+
+    LLM_BACKEND=fake uvicorn main:app --port 8000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+SAMPLE_DOCUMENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'attentionisallyouneed.txt')
+DEFAULT_URLS = {
+    'transform': os.getenv('TRANSFORM_API_URL', 'http://localhost:8000'),
+    'extract': os.getenv('EXTRACT_API_URL', 'http://localhost:8001'),
+}
+DEFAULT_SIZES = '280:0.5,2000:0.35,20000:0.15'
+
+
+def parse_sizes(spec: str) -> list:
+    """'280:0.5,2000:0.5' -> [(280, 0.5), (2000, 0.5)]; weights default to 1."""
+    sizes = []
+    for part in spec.split(','):
+        size, _, weight = part.partition(':')
+        sizes.append((int(size), float(weight or 1)))
+    return sizes
+
+
+def load_corpus() -> str:
+    try:
+        with open(SAMPLE_DOCUMENT, encoding='utf-8') as f:
+            return ' '.join(f.read().split())
+    except FileNotFoundError:
+        return ' '.join(['The quick brown fox jumps over the lazy dog near Santa Cruz.'] * 200)
+
+
+class TextSampler:
+    """Draws texts of weighted random sizes from the sample document."""
+
+    def __init__(self, sizes: list, seed: int = 0, unique: bool = True):
+        self.corpus = load_corpus()
+        self.sizes = [size for size, _ in sizes]
+        self.weights = [weight for _, weight in sizes]
+        self.rng = random.Random(seed)
+        self.unique = unique
+        self.counter = 0
+
+    def sample(self) -> str:
+        size = self.rng.choices(self.sizes, self.weights)[0]
+        repeated = self.corpus * (size // len(self.corpus) + 2)
+        start = self.rng.randrange(len(self.corpus))
+        text = repeated[start:start + size]
+        if self.unique:
+            # Distinct texts so the servers' caches don't turn the test into a cache benchmark
+            self.counter += 1
+            text = f'{self.counter}. {text}'[:max(size, 1)]
+        return text
+
+
+def build_request(target: str, text: str, args) -> tuple:
+    if target == 'extract':
+        return '/extract', {'text': text, 'p': args.p}
+    return '/transform', {'text': text, 'mode': args.mode}
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Results:
+    def __init__(self):
+        self.requests = 0
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.bytes = 0
+        self.started = None
+        self.finished = None
+
+    def record(self, latency: float, status: int = None, error: str = None, size: int = 0):
+        """One finished request; it only counts as ok with a status below 400 and no error."""
+        self.requests += 1
+        if error is None and status is not None and status < 400:
+            self.latencies.append(latency)
+        if status is not None:
+            self.statuses[status] += 1
+        if error is not None:
+            self.errors[error] += 1
+        self.bytes += size
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        total = self.requests
+        ok = len(self.latencies)
+        latencies = sorted(self.latencies)
+        return {
+            'requests': total,
+            'ok': ok,
+            'error_rate': (total - ok) / total if total else 0.0,
+            'elapsed_s': elapsed,
+            'throughput_rps': ok / elapsed if elapsed else 0.0,
+            'latency_ms': {
+                'mean': sum(latencies) / ok * 1000 if ok else 0.0,
+                'p50': percentile(latencies, 50) * 1000,
+                'p95': percentile(latencies, 95) * 1000,
+                'p99': percentile(latencies, 99) * 1000,
+                'max': latencies[-1] * 1000 if latencies else 0.0,
+            },
+            'status_codes': {str(code): count for code, count in sorted(self.statuses.items())},
+            'errors': dict(self.errors),
+            'received_bytes': self.bytes,
+        }
+
+
+def application_error(target: str, response: httpx.Response):
+    """
+    Error reported in a 2xx body, or None. /transform answers 200 with
+    {"success": false, "error": ...} when the LLM call fails.
+    """
+    if target == 'extract' or response.status_code >= 400:
+        return None
+    try:
+        payload = response.json()
+    except ValueError:
+        return 'invalid JSON response'
+    if isinstance(payload, dict) and payload.get('success') is False:
+        # Numbers masked and truncated so per-request details don't make every message unique
+        return f"success=false: {re.sub(r'[0-9]+', 'N', str(payload.get('error')))[:60]}"
+    return None
+
+
+async def send(client: httpx.AsyncClient, target: str, sampler: TextSampler, args,
+               results: Results, scheduled: float = None):
+    path, body = build_request(target, sampler.sample(), args)
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        response = await client.post(path, json=body)
+        results.record(time.perf_counter() - start, status=response.status_code,
+                       error=application_error(target, response), size=len(response.content))
+    except httpx.HTTPError as e:
+        results.record(time.perf_counter() - start, error=type(e).__name__)
+
+
+async def run_target(target: str, url: str, args) -> dict:
+    sampler = TextSampler(parse_sizes(args.sizes), seed=args.seed, unique=not args.repeat_texts)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = Results()
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    def more(sent: int) -> bool:
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        return args.requests is None or sent < args.requests
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+        for _ in range(args.warmup):
+            await send(client, target, sampler, args, Results())
+
+        results.started = time.perf_counter()
+        sent = 0
+        if args.rate:
+            # Open loop: start requests on schedule, at most --concurrency in flight
+            slots = asyncio.Semaphore(args.concurrency)
+            tasks = []
+            interval = 1 / args.rate
+
+            async def scheduled_send(scheduled):
+                async with slots:
+                    await send(client, target, sampler, args, results, scheduled=scheduled)
+
+            while more(sent):
+                scheduled = results.started + sent * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(scheduled_send(scheduled)))
+                sent += 1
+            await asyncio.gather(*tasks)
+        else:
+            # Closed loop: each worker sends back-to-back
+            async def worker():
+                nonlocal sent
+                while more(sent):
+                    sent += 1
+                    await send(client, target, sampler, args, results)
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        results.finished = time.perf_counter()
+
+    summary = results.summary()
+    summary.update(target=target, url=url, concurrency=args.concurrency, rate=args.rate)
+    return summary
+
+
+def print_summary(summary: dict):
+    latency = summary['latency_ms']
+    print(f"\n=== {summary['target']} ({summary['url']}) ===")
+    print(f"Requests:   {summary['requests']} in {summary['elapsed_s']:.2f}s "
+          f"({summary['ok']} ok, {summary['error_rate']:.2%} errors)")
+    print(f"Throughput: {summary['throughput_rps']:.1f} req/s")
+    print(f"Latency:    p50 {latency['p50']:.1f} ms  p95 {latency['p95']:.1f} ms  "
+          f"p99 {latency['p99']:.1f} ms  max {latency['max']:.1f} ms  (mean {latency['mean']:.1f} ms)")
+    print(f"Statuses:   {summary['status_codes']}")
+    if summary['errors']:
+        print(f"Errors:     {summary['errors']}")
+
+
+async def main(args) -> int:
+    targets = ['extract', 'transform'] if args.target == 'both' else [args.target]
+    urls = {'extract': args.extract_url, 'transform': args.transform_url}
+    summaries = [await run_target(target, urls[target], args) for target in targets]
+    for summary in summaries:
+        print_summary(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    return 0 if all(s['ok'] for s in summaries) else 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP load generator for /extract and /transform')
+    parser.add_argument('target', choices=['extract', 'transform', 'both'])
+    parser.add_argument('--extract-url', default=DEFAULT_URLS['extract'])
+    parser.add_argument('--transform-url', default=DEFAULT_URLS['transform'])
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='max requests in flight (default 16)')
+    parser.add_argument('-r', '--rate', type=float, default=0, help='open-loop requests/s (default: closed loop)')
+    parser.add_argument('-n', '--requests', type=int, help='stop after this many requests')
+    parser.add_argument('-d', '--duration', type=float, help='stop after this many seconds')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'text size distribution chars:weight,... (default {DEFAULT_SIZES})')
+    parser.add_argument('--repeat-texts', action='store_true', help='allow identical texts (exercise server caches)')
+    parser.add_argument('--mode', default='brainrot', help='transform mode')
+    parser.add_argument('-p', type=float, default=0.5, help='extract sampling percentage')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests first (default 2)')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='write results as JSON')
+    args = parser.parse_args(argv)
+    if args.requests is None and args.duration is None:
+        args.requests = 200
+    return args
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(parse_args())))
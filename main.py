@@ -1,12 +1,58 @@
-from typing import Union
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import List, Optional, Union
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+import asyncio
+import json
 import logging
+import os
+import time
 import model  # Import the model.py module
+from api.config import REDACTION_BATCH_FRACTION
+from api.executor import (
+    ExecutorBusyError,
+    ExtractionTimeoutError,
+    get_executor,
+    shutdown_executor,
+    warm_up_executor,
+)
+from api.keyphrase_extractor import extract_keyphrases, shutdown_shard_pool
+from api.metrics import install_metrics
+from api.utils import build_redaction_schedule
+from api.readiness import Readiness, install_readiness
+from resilience import RejectedError, Reservation
 
 logging.basicConfig(level=logging.INFO)
-app = FastAPI()
+
+
+async def init_llm_backend():
+    # Key file read, SDK import and opening the cache file run off the event loop so /health answers meanwhile
+    if await asyncio.to_thread(model.init_backend) is None:
+        raise RuntimeError(f"LLM backend '{model.LLM_BACKEND}' is not configured")
+
+
+readiness = Readiness()
+readiness.add_step("llm_backend", init_llm_backend)
+# spaCy is only needed for /transform/extract; WARMUP_EXTRACTION=0 skips loading it at startup
+if os.getenv('WARMUP_EXTRACTION', '1') != '0':
+    readiness.add_step("spacy", warm_up_executor)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    readiness.start()
+    yield
+    await readiness.stop()
+    if model.transform_cache.store is not None:
+        await asyncio.to_thread(model.transform_cache.store.close)
+    # The extraction pools exist if spaCy was warmed or /transform/extract was used
+    shutdown_executor()
+    shutdown_shard_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS so the HTML frontend can call this API
 app.add_middleware(
@@ -17,10 +63,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# GET /ready: 503 until the LLM backend is initialized and spaCy is warm
+install_readiness(app, readiness)
+
+# GET /metrics: request counts, in-flight requests, route and per-stage transform latency
+install_metrics(app)
+
+@app.exception_handler(RejectedError)
+async def rejected_handler(request: Request, exc: RejectedError):
+    """Shed load: 429 when the LLM queue is full, 503 while the circuit is open."""
+    return JSONResponse(
+        {"success": False, "error": str(exc), "retry_after": exc.retry_after},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # Request model for text transformation
 class TransformRequest(BaseModel):
     text: str
     mode: str = 'brainrot'
+    session_id: str = 'default'
+    chunked: Optional[bool] = None  # long-document mode; default: auto by length
+
+
+# Request model for the fused transform + keyphrase extraction endpoint
+class TransformExtractRequest(TransformRequest):
+    p: float = Field(default=1.0, ge=0.0, le=1.0)
+    seed: Optional[int] = None
+    schedule: bool = False  # also return the progressive redaction schedule, as /extract does
+    batch_fraction: float = Field(default=REDACTION_BATCH_FRACTION, gt=0.0, le=1.0)
+
+
+# Request model for transforming one text in several modes at once
+class TransformModesRequest(BaseModel):
+    text: str
+    modes: Union[List[str], str] = 'all'  # list of model.prompts modes, or "all"
+    session_id: str = 'default'
+    chunked: Optional[bool] = None
 
 
 @app.get("/")
@@ -33,11 +113,155 @@ async def transform_text_endpoint(request: TransformRequest):
     """
     Receives text and mode from canvas.html and returns transformed text from model.py
     """
-    # Call the transform_text function from model.py
-    result = model.transform_text(request.text, request.mode)
+    # Async path so the event loop keeps serving other requests during the LLM call
     logging.info("/transform called: mode=%s text_len=%d", request.mode, len(request.text or ""))
-    return result
+    result = await model.transform_text_async(request.text, request.mode, request.session_id, request.chunked)
     logging.info("/transform result: %s", {k: (v if k != 'transformed_text' else '<omitted>') for k, v in result.items()})
+    return result
+
+
+@app.post("/transform/extract")
+async def transform_extract_endpoint(request: TransformExtractRequest):
+    """
+    Transforms the text and extracts keyphrases from the result in one call,
+    saving canvas.html a second round trip (and re-uploading the text).
+    Returns the transformed text, its keyphrase spans (plus the redaction
+    schedule with schedule=true) and per-stage timings.
+    """
+    logging.info("/transform/extract called: mode=%s text_len=%d", request.mode, len(request.text or ""))
+    started = time.perf_counter()
+    # A cached transform was already recorded by the call that produced it
+    # (canvas.html streams the text first), so record history only for new ones
+    record_history = not model.is_cached(request.text or "", request.mode, request.chunked)
+    result = await model.transform_text_async(request.text, request.mode, request.session_id, request.chunked,
+                                              record_history=record_history)
+    transformed_at = time.perf_counter()
+    timings = {"transform_ms": (transformed_at - started) * 1000}
+    if not result.get("success"):
+        return {**result, "timings": timings}
+
+    try:
+        keyphrases = await get_executor().run(
+            extract_keyphrases,
+            text=result["transformed_text"],
+            p=request.p,
+            seed=request.seed,
+        )
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExtractionTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    finished = time.perf_counter()
+    timings["extract_ms"] = (finished - transformed_at) * 1000
+    timings["total_ms"] = (finished - started) * 1000
+    response = {**result, "keyphrases": keyphrases, "timings": timings}
+    if request.schedule:
+        response["schedule"] = build_redaction_schedule(len(keyphrases), request.batch_fraction, request.seed)
+    return response
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class ReservedEventStream(StreamingResponse):
+    """
+    Server-sent events backed by an admission reservation, which is released
+    once the response ends, even if the client left before the body started.
+    """
+
+    def __init__(self, content, reservation: Reservation):
+        super().__init__(
+            content,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        self.reservation = reservation
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.reservation.release()
+
+
+@app.post("/transform/stream")
+async def transform_stream_endpoint(request: TransformRequest):
+    """
+    Streams the transformed text to canvas.html as server-sent events:
+    `chunk` events carry {"text": ...}, then a final `done` or `error` event.
+    """
+    logging.info("/transform/stream called: mode=%s text_len=%d", request.mode, len(request.text or ""))
+    # Claim the LLM slot's queue place now, so a full queue is a 429/503
+    # before the 200 and event-stream headers go out
+    reservation = model.reserve_admission()
+
+    async def events():
+        try:
+            async for chunk in model.stream_transform(
+                request.text, request.mode, request.session_id, reservation, request.chunked
+            ):
+                yield sse_event("chunk", {"text": chunk})
+        except RejectedError as e:
+            yield sse_event("error", {"error": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logging.exception("/transform/stream failed")
+            yield sse_event("error", {"error": str(e) or type(e).__name__})
+        else:
+            yield sse_event("done", {})
+
+    return ReservedEventStream(events(), reservation)
+
+
+@app.post("/transform/modes")
+async def transform_modes_endpoint(request: TransformModesRequest):
+    """
+    Transforms the text in several modes concurrently and streams each mode's
+    result as server-sent events in completion order: one `result` event per
+    mode ({"mode", "success", "transformed_text" or "error", "elapsed_ms"}),
+    then `done`. Total latency is the slowest mode, not the sum.
+    """
+    try:
+        modes = model.resolve_modes(request.modes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logging.info("/transform/modes called: modes=%s text_len=%d", modes, len(request.text or ""))
+    # Claim a place for every LLM call the modes need (one per uncached chunk
+    # in long-document mode), so a request that cannot be admitted as a whole
+    # gets a 429 instead of per-mode errors
+    reservation = model.reserve_admission(model.uncached_mode_calls(request.text, modes, request.chunked))
+    started = time.perf_counter()
+
+    async def events():
+        try:
+            async for mode, result, elapsed in model.transform_modes_async(
+                request.text, modes, request.session_id, request.chunked, reservation
+            ):
+                yield sse_event("result", {"mode": mode, **result, "elapsed_ms": round(elapsed * 1000, 1)})
+        except Exception as e:
+            logging.exception("/transform/modes failed")
+            yield sse_event("error", {"error": str(e) or type(e).__name__})
+        else:
+            yield sse_event("done", {"modes": len(modes), "total_ms": round((time.perf_counter() - started) * 1000, 1)})
+
+    return ReservedEventStream(events(), reservation)
+
+
+@app.get("/transform/stats")
+def transform_stats():
+    """Transform cache hit/miss/coalesced counters, LLM admission queue and circuit breaker."""
+    return {
+        **model.transform_cache.stats(),
+        "admission": model.admission.stats(),
+        "circuit_breaker": model.breaker.stats(),
+    }
+
+
+@app.get("/history")
+def history_stats():
+    """History store size and eviction counters."""
+    return model.history.stats()
 
 
 @app.get("/health")
@@ -1,51 +1,163 @@
-import logging, os
-try:
-    from google import genai
-except Exception:
-    genai = None
-
-# Load API key
-client = None
-api_key = None
-# Environment variable names to check (in order)
+import asyncio, atexit, logging, os, re, threading, time
+from history_store import HistoryStore
+from transform_cache import PersistentStore, TransformCache, make_key
+from api.metrics import REGISTRY
+from llm_backends import LLMBackend, create_backend
+from resilience import (
+    AdmissionController, CircuitBreaker, RejectedError, Reservation, RetryPolicy,
+    call_with_retries, call_with_retries_sync,
+)
+
+# 'gemini' (default), 'fake' (offline echo, see llm_backends.FakeBackend) or 'module:ClassName'
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+LLM_MODEL = os.getenv('LLM_MODEL', 'gemini-2.5-flash')
+
+# Environment variable names to check for the API key (in order)
 env_keys = [
     'GENAI_API_KEY',
     'GOOGLE_API_KEY',
     'GOOGLE_GENERATIVE_API_KEY',
 ]
-for k in env_keys:
-    v = os.getenv(k)
-    if v:
-        api_key = v.strip()
-        logging.info('Using API key from env var %s', k)
-        break
-
-if api_key is None:
-    # Fallback to file
+
+# Set by init_backend(); None until then, or if initialization failed
+backend: LLMBackend = None
+_backend_initialized = False
+_backend_lock = threading.Lock()
+
+
+def load_api_key() -> str:
+    """API key from the environment, falling back to super_top_secret.txt (None if absent)."""
+    api_key = None
+    for k in env_keys:
+        v = os.getenv(k)
+        if v:
+            api_key = v.strip()
+            logging.info('Using API key from env var %s', k)
+            break
+
+    if api_key is None:
+        # Fallback to file
+        try:
+            with open('super_top_secret.txt', 'r') as f:
+                api_key = f.read().strip()
+                logging.info('Loaded API key from super_top_secret.txt')
+        except FileNotFoundError:
+            logging.warning('super_top_secret.txt not found; LLM client will be unavailable')
+        except Exception as e:
+            logging.exception('Failed to read super_top_secret.txt: %s', e)
+
+    # Sanitize common wrapper quoting
+    if api_key:
+        if (api_key.startswith('"') and api_key.endswith('"')) or (api_key.startswith("'") and api_key.endswith("'")):
+            api_key = api_key[1:-1].strip()
+    return api_key
+
+
+def init_backend() -> LLMBackend:
+    """
+    Read the API key and build the LLM backend (once; later calls return it),
+    and open the persistent transform cache.
+
+    main.py calls this from its lifespan so importing this module stays cheap
+    (no SDK import, no SQLite file or writer thread) and the work happens
+    before the first request instead of during it. Direct callers of the
+    transform functions get it lazily on first use.
+    """
+    global backend, _backend_initialized
+    with _backend_lock:
+        if not _backend_initialized:
+            init_cache_store()
+            try:
+                api_key = load_api_key() if LLM_BACKEND == 'gemini' else None
+                backend = create_backend(LLM_BACKEND, api_key=api_key, model=LLM_MODEL)
+                logging.info('Using LLM backend: %s', backend.describe())
+            except Exception as e:
+                logging.exception('Failed to initialize LLM backend %s: %s', LLM_BACKEND, e)
+            _backend_initialized = True
+    return backend
+
+
+def init_cache_store() -> None:
+    """Attach the SQLite tier at TRANSFORM_CACHE_PATH to transform_cache, unless disabled or already open."""
+    if not TRANSFORM_CACHE_PATH or transform_cache.store is not None:
+        return
     try:
-        with open('super_top_secret.txt', 'r') as f:
-            api_key = f.read().strip()
-            print("LOADED API KEY ")
-            logging.info('Loaded API key from super_top_secret.txt')
-    except FileNotFoundError:
-        logging.warning('super_top_secret.txt not found; LLM client will be unavailable')
+        transform_cache.store = PersistentStore(
+            TRANSFORM_CACHE_PATH, ttl=TRANSFORM_CACHE_DISK_TTL, max_bytes=TRANSFORM_CACHE_MAX_BYTES,
+        )
     except Exception as e:
-        logging.exception('Failed to read super_top_secret.txt: %s', e)
+        # The in-memory cache still works without it
+        logging.exception('Failed to open transform cache %s: %s', TRANSFORM_CACHE_PATH, e)
+
+
+def get_backend() -> LLMBackend:
+    """The LLM backend, initializing it on first use."""
+    return backend if _backend_initialized else init_backend()
+
+
+# Conversation history: per-session ring buffers under a global byte cap,
+# optionally appended to a JSONL file (HISTORY_PATH)
+history = HistoryStore(
+    max_per_session=int(os.getenv('HISTORY_MAX_PER_SESSION', '50')),
+    max_bytes=int(os.getenv('HISTORY_MAX_BYTES', str(16 * 1024 * 1024))),
+    path=os.getenv('HISTORY_PATH') or None,
+)
+atexit.register(history.close)
 
-# Sanitize common wrapper quoting
-if api_key:
-    if (api_key.startswith('"') and api_key.endswith('"')) or (api_key.startswith("'") and api_key.endswith("'")):
-        api_key = api_key[1:-1].strip()
+# LLM call settings (override via environment)
+TRANSFORM_CONCURRENCY = int(os.getenv('TRANSFORM_CONCURRENCY', '32'))  # max in-flight async LLM calls
+TRANSFORM_TIMEOUT = float(os.getenv('TRANSFORM_TIMEOUT', '60'))  # seconds, including queueing and retries
+TRANSFORM_QUEUE_SIZE = int(os.getenv('TRANSFORM_QUEUE_SIZE', '64'))  # calls waiting for a slot before 429
 
-try:
-    if genai is not None and api_key:
-        client = genai.Client(api_key=api_key)
-        logging.info('GenAI client initialized (masked key prefix: %s)', api_key[:8])
-except Exception as e:
-    logging.exception('Failed to initialize GenAI client: %s', e)
+# Transient upstream errors (throttling, 5xx, dropped connections) are retried
+# with exponential backoff and full jitter while the request deadline allows
+LLM_MAX_ATTEMPTS = int(os.getenv('LLM_MAX_ATTEMPTS', '3'))
+LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))  # seconds
+LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '8'))  # seconds
 
-# Global dictionary to store conversation history (if needed for a stateful chat)
-history = {}
+# After BREAKER_FAILURE_THRESHOLD consecutive transient failures, calls fail
+# fast for BREAKER_RESET_TIMEOUT seconds, then a single probe is let through
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', '30'))
+
+admission = AdmissionController(TRANSFORM_CONCURRENCY, TRANSFORM_QUEUE_SIZE)
+breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+retry_policy = RetryPolicy(LLM_MAX_ATTEMPTS, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY)
+
+# Long-document mode: inputs over LONG_DOCUMENT_CHARS are split into chunks of
+# at most CHUNK_MAX_CHARS, transformed concurrently and stitched back in order
+LONG_DOCUMENT_CHARS = int(os.getenv('LONG_DOCUMENT_CHARS', '8000'))
+CHUNK_MAX_CHARS = int(os.getenv('CHUNK_MAX_CHARS', '4000'))
+CHUNK_CONCURRENCY = int(os.getenv('CHUNK_CONCURRENCY', '8'))  # per document; TRANSFORM_CONCURRENCY still applies
+
+# Cache of successful transforms keyed on (mode, prompt template, text)
+TRANSFORM_CACHE_SIZE = int(os.getenv('TRANSFORM_CACHE_SIZE', '1024'))
+TRANSFORM_CACHE_TTL = float(os.getenv('TRANSFORM_CACHE_TTL', '3600'))  # seconds
+# Results also go to a SQLite file so they survive restarts; '' keeps the cache in memory only.
+# The file is opened by init_backend(), not at import.
+TRANSFORM_CACHE_PATH = os.getenv('TRANSFORM_CACHE_PATH', 'transform_cache.sqlite3')
+TRANSFORM_CACHE_DISK_TTL = float(os.getenv('TRANSFORM_CACHE_DISK_TTL', str(7 * 24 * 3600)))  # seconds
+TRANSFORM_CACHE_MAX_BYTES = int(os.getenv('TRANSFORM_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+transform_cache = TransformCache(max_entries=TRANSFORM_CACHE_SIZE, ttl=TRANSFORM_CACHE_TTL)
+
+# Metrics (GET /metrics on main.py); stages: prompt_build, llm_wait (for a
+# TRANSFORM_CONCURRENCY slot), llm_call, llm_first_chunk (streaming) and total
+TRANSFORM_REQUESTS = REGISTRY.counter(
+    'transform_requests_total', 'Transforms by mode and outcome (success, error, cache_hit)', ('mode', 'outcome'))
+TRANSFORM_STAGE_LATENCY = REGISTRY.histogram(
+    'transform_stage_seconds', 'Transform latency by stage and mode', ('stage', 'mode'))
+LLM_IN_FLIGHT = REGISTRY.gauge('llm_calls_in_flight', 'LLM calls currently running')
+LLM_RETRIES = REGISTRY.counter('llm_retries_total', 'LLM calls retried after a transient error', ('mode',))
+TRANSFORM_REJECTED = REGISTRY.counter(
+    'transform_rejected_total', 'Transforms shed before reaching the LLM', ('reason',))
+REGISTRY.gauge('llm_queue_waiting', 'LLM calls waiting for a TRANSFORM_CONCURRENCY slot',
+               function=lambda: admission.stats()['waiting'])
+REGISTRY.gauge('llm_circuit_open', 'LLM circuit breaker state (0 closed, 1 half open, 2 open)',
+               function=lambda: {'closed': 0, 'half_open': 1, 'open': 2}[breaker.state])
+REGISTRY.gauge('transform_cache_entries', 'Cached transforms',
+               function=lambda: transform_cache.stats()['entries'])
+REGISTRY.gauge('transform_cache_hit_ratio', 'Transform cache (memory + disk hits + coalesced) / lookups since startup',
+               function=lambda: transform_cache.stats()['hit_rate'])
 
 
 prompts = {
@@ -73,13 +185,141 @@ prompts = {
     }
 
 
-def transform_text(user_input: str, mode: str = 'brainrot') -> dict:
+def mode_label(mode: str) -> str:
+    """Metrics label for a mode; unknown modes share one label to bound cardinality."""
+    return mode if mode in prompts else 'other'
+
+
+def _count_rejection(error: RejectedError) -> None:
+    TRANSFORM_REJECTED.inc(reason='overloaded' if error.status_code == 429 else 'circuit_open')
+
+
+def check_admission(reservation: Reservation = None) -> None:
+    """
+    Raise RejectedError if a new LLM call would be shed right now: circuit
+    open, or queue full and no place left in `reservation`.
+    """
+    try:
+        breaker.check()
+        if reservation is None or not reservation.remaining:
+            admission.check()
+    except RejectedError as e:
+        _count_rejection(e)
+        raise
+
+
+def reserve_admission(count: int = 1) -> Reservation:
+    """
+    Claim queue places for `count` LLM calls now, raising RejectedError if shed.
+
+    For streamed responses, which must be rejected with 429/503 before their
+    headers go out: the calls made later with the reservation are admitted
+    without being checked again. Release it when the response ends.
+    """
+    if count <= 0:
+        return Reservation(admission, 0)
+    try:
+        breaker.check()
+        return admission.reserve(count)
+    except RejectedError as e:
+        _count_rejection(e)
+        raise
+
+
+def _on_retry(mode: str):
+    def on_retry(attempt: int, error: Exception, delay: float) -> None:
+        LLM_RETRIES.inc(mode=mode_label(mode))
+        logging.warning('LLM call attempt %d failed (%s); retrying in %.2fs', attempt, error, delay)
+    return on_retry
+
+
+def build_prompt(user_input: str, mode: str = 'brainrot') -> str:
+    """Fill the prompt template for a mode (unknown modes fall back to brainrot)."""
+    started = time.perf_counter()
+    prompt = prompts.get(mode, prompts['brainrot']).format(user_input=user_input)
+    TRANSFORM_STAGE_LATENCY.observe(time.perf_counter() - started, stage='prompt_build', mode=mode_label(mode))
+    return prompt
+
+
+_PARAGRAPH_BREAK = re.compile(r'(\n\s*\n)')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])(\s+)')
+_WHITESPACE = re.compile(r'(\s+)')
+
+
+def _pack(pieces: list, max_chars: int) -> list:
+    """Greedily merge (body, separator) pieces into chunks of at most max_chars."""
+    chunks = []
+    body, sep = '', ''
+    for piece, piece_sep in pieces:
+        if (body or sep) and len(body) + len(sep) + len(piece) > max_chars:
+            chunks.append((body, sep))
+            body, sep = piece, piece_sep
+        else:
+            body = body + sep + piece
+            sep = piece_sep
+    if body or sep:
+        chunks.append((body, sep))
+    return chunks
+
+
+def _split_keep(pattern, text: str) -> list:
+    """Split text on a capturing pattern into (body, separator) pairs."""
+    parts = pattern.split(text)
+    return [(parts[i], parts[i + 1] if i + 1 < len(parts) else '') for i in range(0, len(parts), 2)]
+
+
+def split_into_chunks(text: str, max_chars: int = CHUNK_MAX_CHARS) -> list:
+    """
+    Split text into (chunk, separator) pairs of at most max_chars per chunk.
+
+    Splits on paragraph breaks first, then sentence ends, then whitespace, and
+    only cuts mid-word as a last resort. Joining every chunk with its
+    separator reproduces the original text exactly.
+    """
+    pieces = []
+    for paragraph, para_sep in _split_keep(_PARAGRAPH_BREAK, text):
+        if len(paragraph) <= max_chars:
+            pieces.append((paragraph, para_sep))
+            continue
+        sentences = []
+        for sentence, sent_sep in _split_keep(_SENTENCE_BREAK, paragraph):
+            if len(sentence) <= max_chars:
+                sentences.append((sentence, sent_sep))
+                continue
+            words = []
+            for word, word_sep in _split_keep(_WHITESPACE, sentence):
+                while len(word) > max_chars:
+                    words.append((word[:max_chars], ''))
+                    word = word[max_chars:]
+                words.append((word, word_sep))
+            words[-1] = (words[-1][0], words[-1][1] + sent_sep)
+            sentences.extend(_pack(words, max_chars))
+        sentences[-1] = (sentences[-1][0], sentences[-1][1] + para_sep)
+        pieces.extend(_pack(sentences, max_chars))
+    return _pack(pieces, max_chars)
+
+
+def cache_key(user_input: str, mode: str = 'brainrot') -> str:
+    """Cache key for a transform: hash of mode, the prompt template it uses, and the text."""
+    return make_key(mode, prompts.get(mode, prompts['brainrot']), user_input)
+
+
+def _is_success(result: dict) -> bool:
+    return bool(result.get("success"))
+
+
+def _record_history(user_input: str, transformed_text: str, mode: str, session_id: str) -> None:
+    history.append(session_id, user_input, transformed_text, mode)
+
+
+def transform_text(user_input: str, mode: str = 'brainrot', session_id: str = 'default') -> dict:
     """
     Transform text using Gemini AI based on the selected mode.
     
     Args:
         user_input: The text to transform
         mode: The transformation mode (brainrot, corporate, emoji, argumentative, forgetful)
+        session_id: Conversation the exchange is recorded under in history
     
     Returns:
         Dictionary with success status and transformed_text or error
@@ -88,32 +328,407 @@ def transform_text(user_input: str, mode: str = 'brainrot') -> dict:
     if not user_input:
         return {"success": False, "error": "No text provided"}
     
+    get_backend()  # first call also opens the persistent cache tier
+    key = cache_key(user_input, mode)
+    cached = transform_cache.get_persistent(key)
+    if cached is not None:
+        TRANSFORM_REQUESTS.inc(mode=mode_label(mode), outcome='cache_hit')
+        _record_history(user_input, cached["transformed_text"], mode, session_id)
+        return cached
+
     # Get the appropriate prompt for the selected mode
-    prompt = prompts.get(mode, prompts['brainrot']).format(user_input=user_input)
+    prompt = build_prompt(user_input, mode)
     
-    # If client isn't available, return a clear error
-    if client is None:
+    # If no backend is available, return a clear error
+    if get_backend() is None:
         err = "GenAI client not configured (missing or invalid super_top_secret.txt)"
         logging.error(err)
+        TRANSFORM_REQUESTS.inc(mode=mode_label(mode), outcome='error')
         return {"success": False, "error": err}
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-        )
-
-        # response object shape may vary; attempt to read text
-        transformed_text = getattr(response, 'text', None) or getattr(response, 'content', None) or str(response)
+        started = time.perf_counter()
+        LLM_IN_FLIGHT.inc()
+        try:
+            transformed_text = call_with_retries_sync(
+                lambda: backend.generate(prompt),
+                deadline=time.monotonic() + TRANSFORM_TIMEOUT,
+                policy=retry_policy,
+                breaker=breaker,
+                is_transient=backend.is_transient,
+                on_retry=_on_retry(mode),
+            )
+        finally:
+            LLM_IN_FLIGHT.dec()
+            TRANSFORM_STAGE_LATENCY.observe(time.perf_counter() - started, stage='llm_call', mode=mode_label(mode))
 
         # Store in history
-        history[f"{mode}_{len(history)}"] = {
-            "user": user_input,
-            "assistant": transformed_text,
-            "mode": mode,
-        }
+        _record_history(user_input, transformed_text, mode, session_id)
+
+        result = {"success": True, "transformed_text": transformed_text}
+        transform_cache.put(key, result, time.perf_counter() - started)
+        TRANSFORM_REQUESTS.inc(mode=mode_label(mode), outcome='success')
+        return result
+    except Exception as e:
+        logging.exception('Error calling LLM backend')
+        TRANSFORM_REQUESTS.inc(mode=mode_label(mode), outcome='error')
+        return {"success": False, "error": str(e)}
+
+
+async def _generate_async(prompt: str, mode: str, deadline: float, reservation: Reservation = None):
+    """One LLM generation: fail fast if shed, else queue for a slot and retry transient errors."""
+    label = mode_label(mode)
+    check_admission(reservation)
+    waiting = time.perf_counter()
+    # A request keeps its slot while backing off, so retries never push
+    # upstream concurrency past TRANSFORM_CONCURRENCY
+    async with admission.slot(reservation):
+        started = time.perf_counter()
+        TRANSFORM_STAGE_LATENCY.observe(started - waiting, stage='llm_wait', mode=label)
+        LLM_IN_FLIGHT.inc()
+        try:
+            return await call_with_retries(
+                lambda: backend.agenerate(prompt),
+                deadline=deadline,
+                policy=retry_policy,
+                breaker=breaker,
+                is_transient=backend.is_transient,
+                on_retry=_on_retry(mode),
+            )
+        except RejectedError as e:
+            _count_rejection(e)
+            raise
+        finally:
+            LLM_IN_FLIGHT.dec()
+            TRANSFORM_STAGE_LATENCY.observe(time.perf_counter() - started, stage='llm_call', mode=label)
+
 
+async def transform_text_async(user_input: str, mode: str = 'brainrot', session_id: str = 'default',
+                               chunked: bool = None, reservation: Reservation = None,
+                               record_history: bool = True) -> dict:
+    """
+    Async version of transform_text for use inside the event loop.
+    
+    Uses the LLM backend's async API, so the event loop keeps serving other
+    requests while the LLM call runs. At most TRANSFORM_CONCURRENCY calls are
+    in flight at once, and each request gives up after TRANSFORM_TIMEOUT seconds.
+    Successful results are cached, and concurrent identical requests share a
+    single upstream call.
+    
+    Args:
+        chunked: Force (True) or disable (False) long-document mode; by
+            default it is used for inputs over LONG_DOCUMENT_CHARS
+        reservation: Admission places claimed up front (see reserve_admission)
+        record_history: Record the exchange in history (off when the caller
+            already has, e.g. the fused call after a stream)
+    
+    Returns:
+        Dictionary with success status and transformed_text or error
+    """
+    if not user_input:
+        return {"success": False, "error": "No text provided"}
+
+    started = time.perf_counter()
+    if chunked is None:
+        chunked = len(user_input) > LONG_DOCUMENT_CHARS
+    if chunked:
+        result = await transform_text_chunked_async(user_input, mode, reservation=reservation)
+    else:
+        result = await _transform_cached_async(user_input, mode, reservation)
+    label = mode_label(mode)
+    TRANSFORM_STAGE_LATENCY.observe(time.perf_counter() - started, stage='total', mode=label)
+    TRANSFORM_REQUESTS.inc(mode=label, outcome='success' if result.get("success") else 'error')
+    if record_history and result.get("success"):
+        _record_history(user_input, result["transformed_text"], mode, session_id)
+    return result
+
+
+async def _transform_cached_async(user_input: str, mode: str, reservation: Reservation = None) -> dict:
+    return await transform_cache.get_or_compute(
+        cache_key(user_input, mode),
+        lambda: _transform_uncached_async(user_input, mode, reservation),
+        cacheable=_is_success,
+    )
+
+
+async def _transform_chunks_in_order(user_input: str, mode: str, max_chars: int, concurrency: int,
+                                     reservation: Reservation = None):
+    """
+    Split the text into chunks, transform them concurrently (each through the
+    cache) and yield (index, count, result, separator) in document order.
+    Unfinished chunks are cancelled if the consumer stops early.
+    """
+    chunks = split_into_chunks(user_input, max_chars)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def transform_chunk(body: str) -> dict:
+        if not body.strip():
+            return {"success": True, "transformed_text": body}
+        async with semaphore:
+            return await _transform_cached_async(body, mode, reservation)
+
+    tasks = [asyncio.ensure_future(transform_chunk(body)) for body, _ in chunks]
+    try:
+        for i, (task, (_, sep)) in enumerate(zip(tasks, chunks)):
+            yield i, len(chunks), await task, sep
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _stitch(result: dict, sep: str) -> str:
+    return result["transformed_text"].strip() + sep
+
+
+async def transform_text_chunked_async(user_input: str, mode: str = 'brainrot',
+                                       max_chars: int = CHUNK_MAX_CHARS,
+                                       concurrency: int = CHUNK_CONCURRENCY,
+                                       reservation: Reservation = None) -> dict:
+    """
+    Long-document mode: transform size-bounded chunks concurrently and stitch
+    the results back together in order, keeping the original paragraph and
+    sentence separators. Wall-clock time tracks the slowest chunk rather than
+    the whole document. Each chunk is cached on its own.
+
+    Returns:
+        Dictionary with success status, transformed_text and the chunk count, or error
+    """
+    parts = []
+    count = 0
+    async for i, count, result, sep in _transform_chunks_in_order(user_input, mode, max_chars, concurrency,
+                                                                   reservation):
+        if not result.get("success"):
+            return {"success": False, "error": f"Chunk {i + 1}/{count} failed: {result.get('error')}"}
+        parts.append(_stitch(result, sep))
+    return {"success": True, "transformed_text": ''.join(parts), "chunks": count}
+
+
+def uncached_calls(user_input: str, mode: str, chunked: bool = None) -> int:
+    """
+    How many LLM calls transforming user_input in `mode` will make: one per
+    chunk (long-document mode) or for the whole text, minus those in the
+    in-memory cache (persistent-store hits are not checked, so this may
+    overcount).
+    """
+    if chunked is None:
+        chunked = len(user_input or "") > LONG_DOCUMENT_CHARS
+    if not chunked:
+        return int(cache_key(user_input, mode) not in transform_cache)
+    return sum(1 for body, _ in split_into_chunks(user_input)
+               if body.strip() and cache_key(body, mode) not in transform_cache)
+
+
+def is_cached(user_input: str, mode: str, chunked: bool = None) -> bool:
+    """Whether the transform of user_input is in the in-memory cache, so it needs no LLM call."""
+    return uncached_calls(user_input, mode, chunked) == 0
+
+
+async def _transform_uncached_async(user_input: str, mode: str, reservation: Reservation = None) -> dict:
+    prompt = build_prompt(user_input, mode)
+
+    if get_backend() is None:
+        err = "GenAI client not configured (missing or invalid super_top_secret.txt)"
+        logging.error(err)
+        return {"success": False, "error": err}
+
+    deadline = asyncio.get_running_loop().time() + TRANSFORM_TIMEOUT
+    try:
+        transformed_text = await asyncio.wait_for(_generate_async(prompt, mode, deadline, reservation),
+                                                  TRANSFORM_TIMEOUT)
         return {"success": True, "transformed_text": transformed_text}
+    except RejectedError:
+        # Shed load: main.py turns this into 429/503 with Retry-After
+        raise
+    except asyncio.TimeoutError:
+        err = f"LLM call timed out after {TRANSFORM_TIMEOUT:g}s"
+        logging.error(err)
+        return {"success": False, "error": err}
     except Exception as e:
-        logging.exception('Error calling GenAI client')
+        logging.exception('Error calling LLM backend')
         return {"success": False, "error": str(e)}
+
+
+def resolve_modes(modes) -> list:
+    """Expand "all" (or ["all"]) to every prompt mode; drop duplicates, keep order."""
+    if modes == 'all' or modes == ['all']:
+        return list(prompts)
+    if isinstance(modes, str):
+        modes = [modes]
+    unknown = [mode for mode in modes if mode not in prompts]
+    if unknown:
+        raise ValueError(f"Unknown mode(s): {', '.join(unknown)}; expected {', '.join(prompts)} or 'all'")
+    return list(dict.fromkeys(modes))
+
+
+def uncached_modes(user_input: str, modes, chunked: bool = None) -> list:
+    """
+    The modes whose transform of user_input is not in the in-memory cache,
+    i.e. those that will need an LLM call (see is_cached; persistent-store
+    hits are not checked, so this may overcount).
+    """
+    return [mode for mode in modes if not is_cached(user_input, mode, chunked)]
+
+
+def uncached_mode_calls(user_input: str, modes, chunked: bool = None) -> int:
+    """LLM calls needed to transform user_input in every mode (see uncached_calls)."""
+    return sum(uncached_calls(user_input, mode, chunked) for mode in modes)
+
+
+async def transform_modes_async(user_input: str, modes, session_id: str = 'default',
+                                chunked: bool = None, reservation: Reservation = None):
+    """
+    Transform one text in several modes concurrently, yielding
+    (mode, result, elapsed_seconds) as each finishes.
+
+    Total latency tracks the slowest mode rather than the sum. Each mode goes
+    through transform_text_async (cache, admission control, retries); a mode
+    that is shed yields {"success": False, "error": ..., "retry_after": ...}
+    instead of failing the others. Unfinished modes are cancelled if the
+    consumer stops early. Calls take their places from `reservation` first
+    (see reserve_admission).
+    """
+    modes = resolve_modes(modes)
+    started = time.perf_counter()
+
+    async def run(mode: str):
+        try:
+            result = await transform_text_async(user_input, mode, session_id, chunked, reservation)
+        except RejectedError as e:
+            result = {"success": False, "error": str(e), "retry_after": e.retry_after}
+        return mode, result, time.perf_counter() - started
+
+    tasks = [asyncio.ensure_future(run(mode)) for mode in modes]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def stream_transform(user_input: str, mode: str = 'brainrot', session_id: str = 'default',
+                           reservation: Reservation = None, chunked: bool = None):
+    """
+    Yield transformed text chunks as the LLM generates them.
+    
+    Long documents (see transform_text_async's `chunked`) are transformed
+    chunk by chunk like transform_text_async does, and each stitched chunk is
+    sent as soon as it and the ones before it are done, so the streamed text
+    and its cache entries are the same as a /transform call's.
+    
+    Holds one TRANSFORM_CONCURRENCY slot for the whole stream (taken from
+    `reservation` if given, see reserve_admission) and raises
+    asyncio.TimeoutError if generation runs past TRANSFORM_TIMEOUT, or
+    RejectedError if the call is shed. Transient errors before the first
+    chunk are retried; once text has been sent, an error ends the stream.
+    A cached result is sent as a single chunk; otherwise the full text is
+    recorded in history and the cache once the stream completes.
+    """
+    if not user_input:
+        raise ValueError("No text provided")
+
+    if chunked is None:
+        chunked = len(user_input) > LONG_DOCUMENT_CHARS
+    if chunked:
+        async for text in _stream_chunked(user_input, mode, session_id, reservation):
+            yield text
+        return
+
+    label = mode_label(mode)
+    key = cache_key(user_input, mode)
+    cached = await transform_cache.aget(key)
+    if cached is not None:
+        TRANSFORM_REQUESTS.inc(mode=label, outcome='cache_hit')
+        _record_history(user_input, cached["transformed_text"], mode, session_id)
+        yield cached["transformed_text"]
+        return
+
+    prompt = build_prompt(user_input, mode)
+
+    if get_backend() is None:
+        TRANSFORM_REQUESTS.inc(mode=label, outcome='error')
+        raise RuntimeError("GenAI client not configured (missing or invalid super_top_secret.txt)")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + TRANSFORM_TIMEOUT
+    chunks = []
+    outcome = 'error'
+    try:
+        check_admission(reservation)
+        async with admission.slot(reservation):
+            call_started = loop.time()
+            TRANSFORM_STAGE_LATENCY.observe(call_started - started, stage='llm_wait', mode=label)
+            LLM_IN_FLIGHT.inc()
+            try:
+                attempt = 0
+                while True:
+                    attempt += 1
+                    try:
+                        breaker.before_call()
+                    except RejectedError as e:
+                        _count_rejection(e)
+                        raise
+                    try:
+                        iterator = backend.astream(prompt).__aiter__()
+                        while True:
+                            try:
+                                text = await asyncio.wait_for(iterator.__anext__(), deadline - loop.time())
+                            except StopAsyncIteration:
+                                break
+                            if text:
+                                if not chunks:
+                                    TRANSFORM_STAGE_LATENCY.observe(loop.time() - call_started,
+                                                                    stage='llm_first_chunk', mode=label)
+                                chunks.append(text)
+                                yield text
+                    except asyncio.TimeoutError:
+                        breaker.record_failure()
+                        raise
+                    except (asyncio.CancelledError, GeneratorExit):
+                        breaker.release_probe()
+                        raise
+                    except Exception as e:
+                        if not backend.is_transient(e):
+                            breaker.release_probe()
+                            raise
+                        breaker.record_failure()
+                        # Text already sent can't be taken back, so only retry before the first chunk
+                        delay = None if chunks else retry_policy.next_delay(attempt, deadline, loop.time())
+                        if delay is None:
+                            raise
+                        _on_retry(mode)(attempt, e, delay)
+                        await asyncio.sleep(delay)
+                    else:
+                        breaker.record_success()
+                        break
+            finally:
+                LLM_IN_FLIGHT.dec()
+                TRANSFORM_STAGE_LATENCY.observe(loop.time() - call_started, stage='llm_call', mode=label)
+        outcome = 'success'
+    finally:
+        TRANSFORM_REQUESTS.inc(mode=label, outcome=outcome)
+
+    transformed_text = ''.join(chunks)
+    _record_history(user_input, transformed_text, mode, session_id)
+    transform_cache.put(key, {"success": True, "transformed_text": transformed_text}, loop.time() - started)
+
+
+async def _stream_chunked(user_input: str, mode: str, session_id: str, reservation: Reservation = None):
+    """stream_transform's long-document mode: yield each stitched chunk in order."""
+    label = mode_label(mode)
+    started = time.perf_counter()
+    parts = []
+    outcome = 'error'
+    try:
+        async for i, count, result, sep in _transform_chunks_in_order(user_input, mode, CHUNK_MAX_CHARS,
+                                                                       CHUNK_CONCURRENCY, reservation):
+            if not result.get("success"):
+                raise RuntimeError(f"Chunk {i + 1}/{count} failed: {result.get('error')}")
+            parts.append(_stitch(result, sep))
+            yield parts[-1]
+        outcome = 'success'
+    finally:
+        TRANSFORM_STAGE_LATENCY.observe(time.perf_counter() - started, stage='total', mode=label)
+        TRANSFORM_REQUESTS.inc(mode=label, outcome=outcome)
+    _record_history(user_input, ''.join(parts), mode, session_id)
@@ -0,0 +1,308 @@
+"""Admission control, retries with backoff and a circuit breaker for upstream LLM calls."""
+import asyncio, math, random, threading, time
+from contextlib import asynccontextmanager
+
+
+class RejectedError(Exception):
+    """A call refused before reaching the upstream; retry_after is a hint in whole seconds."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class OverloadedError(RejectedError):
+    """The admission queue is full (HTTP 429)."""
+
+    status_code = 429
+
+
+class CircuitOpenError(RejectedError):
+    """The circuit breaker is open because the upstream is failing (HTTP 503)."""
+
+    status_code = 503
+
+
+class Reservation:
+    """
+    Places claimed in an AdmissionController's queue ahead of the calls that use them.
+
+    Each slot(reservation) call consumes one place instead of re-checking
+    capacity; release() hands back any places that were never used.
+    """
+
+    def __init__(self, controller: "AdmissionController", count: int):
+        self._controller = controller
+        self.remaining = count
+
+    def take(self) -> bool:
+        """Consume one place; False once all are used or released."""
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+    def release(self) -> None:
+        """Return unused places to the controller (idempotent)."""
+        self._controller._waiting -= self.remaining
+        self.remaining = 0
+
+
+class AdmissionController:
+    """
+    Bounds upstream concurrency and the queue in front of it.
+
+    At most `concurrency` calls run at once and at most `queue_size` more wait
+    for a slot; anything beyond that is shed immediately with OverloadedError,
+    whose retry_after estimates when a slot frees up from recent call times.
+    Callers that must know up front whether they will be admitted (e.g.
+    before sending streamed response headers) reserve() places first.
+    """
+
+    def __init__(self, concurrency: int, queue_size: int):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._active = 0
+        self._waiting = 0
+        self._avg_seconds = 1.0  # EWMA of slot hold time, seeds the first Retry-After
+        self.admitted = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        """Seconds until the queue has likely drained by one slot's worth of work."""
+        return (self._waiting + 1) * self._avg_seconds / self.concurrency
+
+    def check(self, count: int = 1) -> None:
+        """Raise OverloadedError if `count` new calls would not be admitted right now."""
+        capacity = self.concurrency + self.queue_size
+        if count > capacity:
+            self.rejected += 1
+            raise OverloadedError(f"Request needs {count} upstream calls; at most {capacity} can be admitted",
+                                  self.retry_after())
+        if self._active + self._waiting + count > capacity:
+            self.rejected += 1
+            raise OverloadedError(
+                f"Too many requests in flight ({self._active} running, {self._waiting} queued)",
+                self.retry_after(),
+            )
+
+    def reserve(self, count: int = 1) -> Reservation:
+        """Claim `count` queue places now, raising OverloadedError if they don't all fit."""
+        self.check(count)
+        self._waiting += count
+        return Reservation(self, count)
+
+    @asynccontextmanager
+    async def slot(self, reservation: Reservation = None):
+        """
+        Hold one upstream slot, waiting in the bounded queue for it if needed.
+
+        With a reservation that still has places, one of them is used and
+        capacity is not checked again.
+        """
+        if reservation is None or not reservation.take():
+            self.check()
+            self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._active += 1
+        self.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "active": self._active,
+            "waiting": self._waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_call_seconds": round(self._avg_seconds, 3),
+        }
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the upstream is unhealthy.
+
+    closed: calls pass; `failure_threshold` consecutive transient failures open it.
+    open: calls fail with CircuitOpenError for `reset_timeout` seconds.
+    half_open: one probe call is let through; success closes, failure re-opens.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.short_circuited = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go upstream now."""
+        with self._lock:
+            if self.state == 'closed':
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == 'open' and remaining <= 0:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return
+            self.short_circuited += 1
+            raise CircuitOpenError(
+                f"Upstream LLM unavailable after {self._failures} consecutive failures; circuit open",
+                max(remaining, 1.0),
+            )
+
+    def check(self) -> None:
+        """Raise CircuitOpenError while open, without claiming the half-open probe."""
+        with self._lock:
+            if self.state != 'open':
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.short_circuited += 1
+                raise CircuitOpenError(
+                    f"Upstream LLM unavailable after {self._failures} consecutive failures; circuit open",
+                    remaining,
+                )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opened += 1
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """A half-open probe ended without a verdict (e.g. a non-transient error)."""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "short_circuited": self.short_circuited,
+            }
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, bounded by attempts and a deadline.
+
+    The delay before retry n (1-based) is uniform in [0, min(max_delay, base_delay * 2**(n-1))].
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 seed: int = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = random.Random(seed)
+
+    def backoff(self, attempt: int) -> float:
+        """Delay after failed attempt number `attempt` (1-based)."""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def next_delay(self, attempt: int, deadline: float, now: float):
+        """Backoff before the next attempt, or None if out of attempts or time."""
+        if attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        return delay if now + delay < deadline else None
+
+
+async def call_with_retries(call, *, deadline: float, policy: RetryPolicy, breaker: CircuitBreaker,
+                            is_transient, on_retry=None):
+    """
+    Await call() until it succeeds, retrying transient failures.
+
+    call is a zero-argument coroutine function. Each attempt is bounded by the
+    time left before `deadline` (event loop time) and goes through the
+    breaker. Non-transient errors are raised at once; asyncio.TimeoutError
+    means the deadline passed.
+    """
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    while True:
+        attempt += 1
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        breaker.before_call()
+        try:
+            result = await asyncio.wait_for(call(), remaining)
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            if not is_transient(e):
+                breaker.release_probe()
+                raise
+            breaker.record_failure()
+            delay = policy.next_delay(attempt, deadline, loop.time())
+            if delay is None:
+                raise
+            if on_retry is not None:
+                on_retry(attempt, e, delay)
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+def call_with_retries_sync(call, *, deadline: float, policy: RetryPolicy, breaker: CircuitBreaker,
+                           is_transient, on_retry=None):
+    """Blocking counterpart of call_with_retries; deadline is time.monotonic() time."""
+    attempt = 0
+    while True:
+        attempt += 1
+        if deadline - time.monotonic() <= 0:
+            raise TimeoutError()
+        breaker.before_call()
+        try:
+            result = call()
+        except Exception as e:
+            if not is_transient(e):
+                breaker.release_probe()
+                raise
+            breaker.record_failure()
+            delay = policy.next_delay(attempt, deadline, time.monotonic())
+            if delay is None:
+                raise
+            if on_retry is not None:
+                on_retry(attempt, e, delay)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,320 @@
+"""Tests for admission control, retries and the circuit breaker (offline, FakeBackend)."""
+
+import os
+
+# model.py reads its settings at import time
+os.environ.update({
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY_MS": "200",
+    "TRANSFORM_CONCURRENCY": "2",
+    "TRANSFORM_QUEUE_SIZE": "2",
+    "TRANSFORM_CACHE_PATH": "",
+    "WARMUP_EXTRACTION": "0",
+})
+
+import asyncio
+import sys
+import time
+
+import httpx
+
+import main
+import model
+from llm_backends import FakeBackend, LLMError
+from resilience import (
+    AdmissionController,
+    CircuitBreaker,
+    CircuitOpenError,
+    OverloadedError,
+    RetryPolicy,
+    call_with_retries,
+)
+
+
+def test_breaker():
+    """Consecutive failures open the breaker; after the reset timeout one probe decides."""
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.1)
+
+    print("Test: Circuit Breaker")
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open", "Threshold failures should open the circuit"
+    try:
+        breaker.before_call()
+        assert False, "Open circuit should fail fast"
+    except CircuitOpenError as e:
+        assert e.status_code == 503 and e.retry_after >= 1
+
+    time.sleep(0.15)
+    breaker.before_call()  # the half-open probe
+    assert breaker.state == "half_open"
+    try:
+        breaker.before_call()
+        assert False, "Only one probe may run while half open"
+    except CircuitOpenError:
+        pass
+    breaker.record_failure()
+    assert breaker.state == "open", "A failed probe re-opens the circuit"
+
+    time.sleep(0.15)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed", "A successful probe closes the circuit"
+    print(f"✓ Breaker works: {breaker.stats()}\n")
+    return True
+
+
+def test_retries():
+    """Transient errors are retried until success; non-transient ones and open circuits are not."""
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.02, seed=0)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 5
+
+        # Fails once, then the upstream recovers
+        backend = FakeBackend(error_rate=1.0, seed=0)
+        retries = []
+
+        def recover(attempt, error, delay):
+            retries.append(attempt)
+            backend.error_rate = 0.0
+
+        breaker = CircuitBreaker(failure_threshold=5)
+        text = await call_with_retries(lambda: backend.agenerate("hello world"), deadline=deadline,
+                                       policy=policy, breaker=breaker,
+                                       is_transient=backend.is_transient, on_retry=recover)
+        assert text == "hello world" and retries == [1], retries
+        assert breaker.state == "closed"
+
+        # Always failing: gives up after max_attempts
+        backend = FakeBackend(error_rate=1.0, seed=0)
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            return await backend.agenerate("x")
+
+        try:
+            await call_with_retries(failing, deadline=deadline, policy=policy, breaker=breaker,
+                                    is_transient=backend.is_transient)
+            assert False, "Should raise after the last attempt"
+        except LLMError:
+            pass
+        assert len(calls) == 3, calls
+
+        # Non-transient errors are raised at once
+        calls.clear()
+
+        async def broken():
+            calls.append(1)
+            raise LLMError("bad request", transient=False)
+
+        try:
+            await call_with_retries(broken, deadline=deadline, policy=policy, breaker=breaker,
+                                    is_transient=backend.is_transient)
+            assert False, "Should raise"
+        except LLMError:
+            pass
+        assert len(calls) == 1, calls
+
+        # Enough transient failures open the breaker (here during the retries), which then short-circuits
+        try:
+            await call_with_retries(failing, deadline=deadline, policy=policy, breaker=breaker,
+                                    is_transient=backend.is_transient)
+            assert False, "Should raise"
+        except (LLMError, CircuitOpenError):
+            pass
+        assert breaker.state == "open", breaker.stats()
+        calls.clear()
+        try:
+            await call_with_retries(failing, deadline=deadline, policy=policy, breaker=breaker,
+                                    is_transient=backend.is_transient)
+            assert False, "Open circuit should fail fast"
+        except CircuitOpenError:
+            pass
+        assert not calls, "No upstream call while the circuit is open"
+
+    print("Test: Retries")
+    asyncio.run(run())
+    print("✓ Retries work\n")
+    return True
+
+
+def test_admission():
+    """Slots bound concurrency, the queue is bounded, and reservations hold places up front."""
+
+    async def run():
+        admission = AdmissionController(concurrency=2, queue_size=2)
+        release = asyncio.Event()
+        running = []
+
+        async def call():
+            async with admission.slot():
+                running.append(1)
+                await release.wait()
+
+        tasks = [asyncio.ensure_future(call()) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        assert len(running) == 2 and admission.stats()["waiting"] == 2, admission.stats()
+        try:
+            admission.check()
+            assert False, "Full queue should shed"
+        except OverloadedError as e:
+            assert e.status_code == 429 and e.retry_after >= 1
+        release.set()
+        await asyncio.gather(*tasks)
+
+        # Reservations count against capacity before their slots are taken
+        first = admission.reserve(3)
+        try:
+            admission.reserve(2)
+            assert False, "Only one place is left"
+        except OverloadedError:
+            pass
+        second = admission.reserve(1)
+        async with admission.slot(first):
+            pass
+        first.release()  # two places never used
+        second.release()
+        assert admission.stats()["waiting"] == 0 and admission.stats()["active"] == 0, admission.stats()
+        try:
+            admission.reserve(5)
+            assert False, "More places than capacity can never be admitted"
+        except OverloadedError:
+            pass
+
+    print("Test: Admission Control")
+    asyncio.run(run())
+    print("✓ Admission control works\n")
+    return True
+
+
+def test_stream_rejection():
+    """Concurrent /transform/stream calls beyond capacity get 429 + Retry-After, not a 200 error event."""
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            async def stream(i):
+                async with client.stream("POST", "/transform/stream",
+                                         json={"text": f"stream test {i}", "mode": "emoji"}) as r:
+                    body = (await r.aread()).decode()
+                    return r.status_code, r.headers.get("retry-after"), body
+
+            return await asyncio.gather(*(stream(i) for i in range(8)))
+
+    print("Test: Streaming Admission")
+    results = asyncio.run(run())
+    statuses = sorted(status for status, _, _ in results)
+    print(f"statuses: {statuses}")
+    assert statuses == [200] * 4 + [429] * 4, statuses
+    for status, retry_after, body in results:
+        if status == 200:
+            assert "event: done" in body and "event: error" not in body, body
+        else:
+            assert retry_after and int(retry_after) >= 1
+    assert model.admission.stats()["waiting"] == 0, "Reservations must be released"
+    print("✓ Streams beyond capacity are shed before the response starts\n")
+    return True
+
+
+def test_modes_admission():
+    """/transform/modes reserves a place per uncached mode and gets 429 if they cannot all be admitted."""
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            # Five uncached modes never fit in concurrency 2 + queue 2
+            too_many = await client.post("/transform/modes", json={"text": "modes test", "modes": "all"})
+            assert too_many.status_code == 429 and too_many.headers.get("retry-after"), too_many.text
+
+            fits = await client.post("/transform/modes", json={"text": "modes test", "modes": ["emoji", "corporate"]})
+            assert fits.status_code == 200 and fits.text.count("event: result") == 2, fits.text
+            assert '"success": false' not in fits.text, fits.text
+
+            # Cached modes need no place, so only three are reserved now
+            assert model.uncached_modes("modes test", model.resolve_modes("all")) == [
+                "brainrot", "argumentative", "forgetful"]
+            cached = await client.post("/transform/modes", json={"text": "modes test", "modes": "all"})
+            assert cached.status_code == 200 and cached.text.count("event: result") == 5, cached.text
+            assert '"success": false' not in cached.text, cached.text
+
+            # Long-document mode needs a place per chunk: 2 modes x 3 chunks never fit
+            long_text = "\n\n".join(f"{i} " + "The quick brown fox jumps over the lazy dog. " * 65 for i in range(3))
+            assert model.uncached_mode_calls(long_text, ["emoji", "corporate"]) == 6
+            chunked = await client.post("/transform/modes", json={"text": long_text, "modes": ["emoji", "corporate"]})
+            assert chunked.status_code == 429, chunked.text
+
+    print("Test: Multi-Mode Admission")
+    # Its semaphore is bound to the previous test's event loop
+    model.admission = AdmissionController(model.admission.concurrency, model.admission.queue_size)
+    asyncio.run(run())
+    assert model.admission.stats()["waiting"] == 0, "Reservations must be released"
+    print("✓ Multi-mode requests are admitted as a whole or rejected with 429\n")
+    return True
+
+
+def test_stream_then_transform_cached():
+    """A long streamed transform leaves the same chunk cache entries /transform/extract then hits."""
+    paragraph = "The quick brown fox jumps over the lazy dog near the river bank. " * 45
+    text = "\n\n".join(f"{i} {paragraph}" for i in range(3))
+    assert len(text) > model.LONG_DOCUMENT_CHARS
+
+    async def run():
+        calls = []
+        generate = model.get_backend().agenerate
+
+        async def counting(prompt):
+            calls.append(1)
+            return await generate(prompt)
+
+        model.backend.agenerate = counting
+        try:
+            streamed = "".join([chunk async for chunk in model.stream_transform(text, "corporate", "long")])
+            after_stream = len(calls)
+            assert model.is_cached(text, "corporate"), "Every chunk should be cached after the stream"
+            result = await model.transform_text_async(text, "corporate", "long", record_history=False)
+        finally:
+            del model.backend.agenerate
+        return streamed, after_stream, len(calls), result
+
+    print("Test: Stream Then Fused Transform")
+    model.admission = AdmissionController(model.admission.concurrency, model.admission.queue_size)
+    streamed, after_stream, total_calls, result = asyncio.run(run())
+    print(f"upstream calls: {after_stream} during the stream, {total_calls - after_stream} after")
+    assert after_stream == 3 and total_calls == after_stream, "The second call should be served from cache"
+    assert result["success"] and result["transformed_text"] == streamed
+    assert len(model.history.get("long")) == 1, "History should hold one entry per transform"
+    print("✓ Long streams are chunked and cached like /transform\n")
+    return True
+
+
+def run_tests():
+    """Run automated tests."""
+    print("\n" + "="*60)
+    print("RESILIENCE TESTS")
+    print("="*60 + "\n")
+
+    total_start = time.time()
+    tests = [test_breaker, test_retries, test_admission, test_stream_rejection, test_modes_admission,
+             test_stream_then_transform_cached]
+    passed = 0
+
+    try:
+        for test in tests:
+            if test():
+                passed += 1
+
+        total_elapsed = time.time() - total_start
+        print("="*60)
+        print(f"ALL TESTS PASSED ({passed}/{len(tests)}) in {total_elapsed:.3f}s")
+        print("="*60)
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,174 @@
+"""Tests for the transform cache and its persistent SQLite tier."""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from transform_cache import PersistentStore, TransformCache
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _store(directory, name="cache.sqlite3", **kwargs):
+    # A long flush interval, so only batch_size and flush() trigger writes
+    kwargs.setdefault("flush_interval", 60.0)
+    return PersistentStore(os.path.join(directory, name), **kwargs)
+
+
+def test_import_has_no_side_effects():
+    """Importing model/main opens no SQLite file and starts no writer thread."""
+    with tempfile.TemporaryDirectory() as directory:
+        code = (
+            "import threading, main, model\n"
+            "assert model.transform_cache.store is None\n"
+            "assert not any(t.name == 'transform-cache-writer' for t in threading.enumerate())\n"
+        )
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT, LLM_BACKEND="fake")
+        env.pop("TRANSFORM_CACHE_PATH", None)
+        subprocess.run([sys.executable, "-c", code], cwd=directory, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print("Test: Import Side Effects")
+        print(f"files after import: {os.listdir(directory)}")
+        assert os.listdir(directory) == [], "import must not create the cache file"
+    print("✓ No cache file or writer thread at import\n")
+    return True
+
+
+def test_batched_flush():
+    """put() only queues; the writer runs once batch_size entries are waiting, or on flush()."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = _store(directory, batch_size=10)
+        for i in range(9):
+            store.put(f"k{i}", {"i": i}, 0.5)
+        time.sleep(0.2)
+        stats = store.stats()
+        print("Test: Batched Flush")
+        print(f"after 9 puts: {stats['pending_writes']} pending, {stats['writes']} written")
+        assert stats["writes"] == 0 and stats["pending_writes"] == 9, stats
+        assert store.get("k3") == ({"i": 3}, 0.5), "Queued entries are readable before they are written"
+
+        store.put("k9", {"i": 9})
+        deadline = time.monotonic() + 5
+        while store.stats()["writes"] < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.stats()["writes"] == 10, "A full batch wakes the writer"
+
+        store.put("extra", "value")
+        store.flush()
+        assert store.stats()["pending_writes"] == 0
+        store.close()
+
+        # A new store (as after a restart) reads what was written, without loading it all
+        reopened = _store(directory)
+        assert reopened.get("extra") == ("value", 0.0)
+        assert reopened.stats()["bytes"] == store.stats()["bytes"]
+        reopened.close()
+    print("✓ Writes are batched and survive a restart\n")
+    return True
+
+
+def test_ttl_expiry():
+    """Entries past their TTL are not returned, and are deleted on the next flush."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = _store(directory, ttl=0.2)
+        store.put("a", "fresh")
+        store.flush()
+        assert store.get("a") == ("fresh", 0.0)
+        time.sleep(0.3)
+        print("Test: TTL Expiry")
+        assert store.get("a") is None, "Expired entries are misses"
+        store.put("b", "new")
+        store.flush()
+        stats = store.stats()
+        print(f"after expiry: {stats}")
+        assert stats["evictions"] == 1 and store.get("b") == ("new", 0.0), stats
+        store.close()
+    print("✓ Expired entries are dropped\n")
+    return True
+
+
+def test_size_eviction():
+    """Over max_bytes, the least recently used rows are evicted first."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = _store(directory, max_bytes=3000)
+        for i in range(10):
+            store.put(f"k{i}", "x" * 200)
+        store.flush()
+        time.sleep(0.01)
+        store.get("k0")  # touched: now the most recently used
+        store.flush()
+        for i in range(10, 20):
+            store.put(f"k{i}", "x" * 200)
+        store.flush()
+        stats = store.stats()
+        print("Test: Size Eviction")
+        print(f"stats: {stats}")
+        assert stats["bytes"] <= 3000 and stats["evictions"] > 0, stats
+        assert store.get("k0") is not None, "Recently read entries survive"
+        assert store.get("k1") is None, "Least recently used entries go first"
+        assert store.get("k19") is not None, "Newest entries survive"
+        store.close()
+    print("✓ Size-based LRU eviction works\n")
+    return True
+
+
+def test_cache_with_store():
+    """TransformCache falls through to the store on a memory miss and promotes the hit."""
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"success": True, "transformed_text": "out"}
+
+    async def run(directory):
+        store = _store(directory)
+        first = TransformCache(store=store)
+        await first.get_or_compute("key", compute)
+        store.flush()
+
+        # A fresh in-memory cache over the same file, as after a restart
+        second = TransformCache(store=store)
+        result = await second.get_or_compute("key", compute)
+        assert result["transformed_text"] == "out" and len(calls) == 1, calls
+        assert second.stats()["store_hits"] == 1, second.stats()
+        assert second.get("key") is not None, "Store hits are promoted to memory"
+        assert await TransformCache(store=store).aget("key") is not None
+        store.close()
+
+    print("Test: Cache With Store")
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(directory))
+    print("✓ Persistent results are served after a restart\n")
+    return True
+
+
+def run_tests():
+    """Run automated tests."""
+    print("\n" + "="*60)
+    print("TRANSFORM CACHE TESTS")
+    print("="*60 + "\n")
+
+    total_start = time.time()
+    tests = [test_import_has_no_side_effects, test_batched_flush, test_ttl_expiry,
+             test_size_eviction, test_cache_with_store]
+    passed = 0
+
+    try:
+        for test in tests:
+            if test():
+                passed += 1
+
+        total_elapsed = time.time() - total_start
+        print("="*60)
+        print(f"ALL TESTS PASSED ({passed}/{len(tests)}) in {total_elapsed:.3f}s")
+        print("="*60)
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run_tests()
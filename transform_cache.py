@@ -0,0 +1,391 @@
+"""
+TTL+LRU cache for LLM transforms, with single-flight request coalescing and an
+optional persistent SQLite tier that survives restarts.
+"""
+import asyncio, atexit, hashlib, json, logging, sqlite3, threading, time
+from collections import OrderedDict
+from functools import partial
+
+
+def make_key(mode: str, template: str, text: str) -> str:
+    """Hash of (mode, prompt template, input text)."""
+    h = hashlib.sha256()
+    for part in (mode, template, text):
+        data = part.encode('utf-8')
+        # Length-prefix each part so ('ab', 'c') and ('a', 'bc') can't collide
+        h.update(len(data).to_bytes(8, 'little'))
+        h.update(data)
+    return h.hexdigest()
+
+
+class PersistentStore:
+    """
+    Transform results in a SQLite database (WAL mode), shared across restarts.
+
+    Nothing is loaded at startup; each lookup is one primary-key read on a
+    per-thread connection, so readers never wait on each other or on the
+    writer. put() only queues the entry: a background thread writes queued
+    entries (and last-access times of read entries) in one transaction every
+    `flush_interval` seconds or once `batch_size` are waiting, then drops
+    expired rows and evicts least recently used rows above `max_bytes`.
+    Expiry uses wall-clock time so TTLs hold across restarts.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transforms (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            compute_seconds REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS transforms_last_access ON transforms (last_access);
+        CREATE INDEX IF NOT EXISTS transforms_expires_at ON transforms (expires_at);
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600.0, max_bytes: int = 256 * 1024 * 1024,
+                 batch_size: int = 64, flush_interval: float = 1.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one batch write at a time
+        self._pending = {}  # key -> (value_json, compute_seconds, expires_at), not yet written
+        self._touched = {}  # key -> last access time, not yet written
+        self._wake = threading.Event()
+        self._closed = False
+        self.reads = 0
+        self.hits = 0
+        self.writes = 0
+        self.evictions = 0
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+            # One aggregate query, not a scan into memory
+            self._bytes = conn.execute('SELECT COALESCE(SUM(size), 0) FROM transforms').fetchone()[0]
+        self._writer = threading.Thread(target=self._write_loop, name='transform-cache-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # durable enough for a cache, much faster commits
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def get(self, key: str):
+        """Return (value, compute_seconds) or None. Blocking: use aget() from async code."""
+        now = time.time()
+        with self._lock:
+            self.reads += 1
+            pending = self._pending.get(key)
+            if pending is not None and pending[2] > now:
+                self.hits += 1
+                return json.loads(pending[0]), pending[1]
+        row = self._reader().execute(
+            'SELECT value, compute_seconds FROM transforms WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            self.hits += 1
+            self._touched[key] = now
+        return json.loads(row[0]), row[1]
+
+    async def aget(self, key: str):
+        """get() on a worker thread, so the event loop never waits on disk."""
+        return await asyncio.to_thread(self.get, key)
+
+    def put(self, key: str, value, compute_seconds: float = 0.0) -> None:
+        """Queue an entry for the next batched write."""
+        entry = (json.dumps(value), compute_seconds, time.time() + self.ttl)
+        with self._lock:
+            if self._closed:
+                return
+            self._pending[key] = entry
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._flush(conn)
+            except Exception:
+                logging.exception('Transform cache flush to %s failed', self.path)
+            if self._closed:
+                conn.close()
+                return
+
+    def _flush(self, conn: sqlite3.Connection) -> None:
+        with self._flush_lock:
+            self._flush_locked(conn)
+
+    def _flush_locked(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            touched, self._touched = self._touched, {}
+        if not pending and not touched:
+            return
+        now = time.time()
+        rows = [(key, value, seconds, expires_at, now, len(key) + len(value))
+                for key, (value, seconds, expires_at) in pending.items()]
+        conn.execute('BEGIN')
+        try:
+            if rows:
+                # Net size change: new rows minus the rows they replace
+                replaced = 0
+                for row in rows:
+                    found = conn.execute('SELECT size FROM transforms WHERE key = ?', (row[0],)).fetchone()
+                    replaced += found[0] if found else 0
+                conn.executemany('INSERT OR REPLACE INTO transforms VALUES (?, ?, ?, ?, ?, ?)', rows)
+                self._bytes += sum(row[5] for row in rows) - replaced
+                self.writes += len(rows)
+            if touched:
+                conn.executemany('UPDATE transforms SET last_access = ? WHERE key = ?',
+                                 [(at, key) for key, at in touched.items()])
+            self._evict(conn, now)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            with self._lock:
+                # Keep unwritten entries for the next attempt unless newer ones replaced them
+                for key, entry in pending.items():
+                    self._pending.setdefault(key, entry)
+            raise
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        freed, count = conn.execute(
+            'SELECT COALESCE(SUM(size), 0), COUNT(*) FROM transforms WHERE expires_at <= ?', (now,)
+        ).fetchone()
+        if count:
+            conn.execute('DELETE FROM transforms WHERE expires_at <= ?', (now,))
+            self._bytes -= freed
+            self.evictions += count
+        while self._bytes > self.max_bytes:
+            # Drop the least recently used rows, about a tenth of the budget at a time
+            target = self._bytes - self.max_bytes * 0.9
+            victims = []
+            total = 0
+            for key, size in conn.execute('SELECT key, size FROM transforms ORDER BY last_access'):
+                victims.append((key,))
+                total += size
+                if total >= target:
+                    break
+            if not victims:
+                self._bytes = 0
+                break
+            conn.executemany('DELETE FROM transforms WHERE key = ?', victims)
+            self._bytes -= total
+            self.evictions += len(victims)
+
+    def flush(self) -> None:
+        """Write queued entries now (blocking)."""
+        conn = self._connect()
+        try:
+            self._flush(conn)
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        """Flush queued entries and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=10)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "path": self.path,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "pending_writes": len(self._pending),
+                "reads": self.reads,
+                "hits": self.hits,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+
+class TransformCache:
+    """
+    LRU cache of transform results whose entries expire after `ttl` seconds.
+
+    get_or_compute() also coalesces concurrent identical requests: while one
+    upstream call for a key is in flight, later callers await the same call
+    instead of starting their own.
+
+    With a PersistentStore, memory misses fall through to disk (read off the
+    event loop by aget/get_or_compute) and new results are written behind.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, store: PersistentStore = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._from_store = {}  # key -> compute_seconds, for in-flight loads answered by the store
+        self._entries = OrderedDict()  # key -> (expires_at, value, compute_seconds)
+        self._inflight = {}  # key -> asyncio.Task
+        self._waiters = {}  # key -> callers coalesced onto the in-flight task
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.store_hits = 0
+        self.expired = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0  # upstream time avoided by hits and coalescing
+
+    def get(self, key: str):
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, compute_seconds = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += compute_seconds
+            return value
+
+    def __contains__(self, key: str) -> bool:
+        """Whether an unexpired value is in memory; unlike get(), not counted as a hit."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def _promote(self, key: str, found) -> object:
+        """Copy a (value, compute_seconds) pair read from the store into memory."""
+        value, compute_seconds = found
+        self.put(key, value, compute_seconds, persist=False)
+        with self._lock:
+            self.store_hits += 1
+            self.seconds_saved += compute_seconds
+        return value
+
+    def get_persistent(self, key: str):
+        """get(), falling through to the persistent store. Blocking: for sync callers."""
+        value = self.get(key)
+        if value is None and self.store is not None:
+            found = self.store.get(key)
+            if found is not None:
+                return self._promote(key, found)
+        return value
+
+    async def aget(self, key: str):
+        """get(), falling through to the persistent store on a worker thread."""
+        value = self.get(key)
+        if value is None and self.store is not None:
+            found = await self.store.aget(key)
+            if found is not None:
+                return self._promote(key, found)
+        return value
+
+    def put(self, key: str, value, compute_seconds: float = 0.0, persist: bool = True) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value, compute_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        if persist and self.store is not None:
+            self.store.put(key, value, compute_seconds)
+
+    async def get_or_compute(self, key: str, compute, cacheable=lambda value: True):
+        """
+        Return the cached value for key, or await compute() to produce it.
+
+        compute is a zero-argument coroutine function. Its result is cached
+        only if cacheable(result) is true, so errors are never served from cache.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            # Run the lookup and upstream call as their own task so a cancelled
+            # caller doesn't cancel it for everyone else waiting on the same key
+            task = asyncio.ensure_future(self._load_or_compute(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._finish, key, cacheable, time.perf_counter()))
+        else:
+            with self._lock:
+                self.coalesced += 1
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+        return await asyncio.shield(task)
+
+    async def _load_or_compute(self, key: str, compute):
+        if self.store is not None:
+            found = await self.store.aget(key)
+            if found is not None:
+                value, self._from_store[key] = found
+                return value
+        with self._lock:
+            self.misses += 1
+        return await compute()
+
+    def _finish(self, key, cacheable, started, task) -> None:
+        self._inflight.pop(key, None)
+        waiters = self._waiters.pop(key, 0)
+        stored_seconds = self._from_store.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if stored_seconds is not None:
+            self._promote(key, (task.result(), stored_seconds))
+            with self._lock:
+                self.seconds_saved += stored_seconds * waiters
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.seconds_saved += elapsed * waiters
+        if cacheable(task.result()):
+            self.put(key, task.result(), elapsed)
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Size and hit/miss/coalesced counters, plus the persistent store's if any."""
+        with self._lock:
+            lookups = self.hits + self.store_hits + self.misses + self.coalesced
+            stats = {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "in_flight": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "store_hits": self.store_hits,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "upstream_calls_saved": self.hits + self.store_hits + self.coalesced,
+                "upstream_seconds_saved": round(self.seconds_saved, 3),
+                "hit_rate": (self.hits + self.store_hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+        if self.store is not None:
+            stats["store"] = self.store.stats()
+        return stats